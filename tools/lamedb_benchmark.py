@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Benchmark lamedb koda van risivera (bez enigma2):
+
+    python3 tools/lamedb_benchmark.py                       # 1k, 10k, 100k, 500k servisa, v4 i v5
+    python3 tools/lamedb_benchmark.py --sizes 1000,10000 --format 4
+    python3 tools/lamedb_benchmark.py --file /etc/enigma2/lamedb
+
+Za svaku velicinu generise se sinteticka lamedb (tools/lamedb_synth.py) i
+meri se vreme (najbolje od --repeat) i vrhunac memorije (tracemalloc) za:
+citanje (tekst/mmap/model/snapshot/kes), hladan start iz snapshot-a naspram
+parse-a, tok Data Browser-a za najgusci orbital, izmenu servisa iz editora,
+batch od 30 izmena, dodavanje fake T2MI transpondera, proveru ispravnosti i
+kompaktovanje. Upisi idu kroz
+atomic_replace (fsync fajla i direktorijuma), pa zavise i od diska; backup-i
+se kompresuju u pozadini, a na kraju se meri koliko jos treba da se zavrse. Tokovi ekrana su ovde prepisani
+nad lamedb modulom, jer same ekrane nije moguce ucitati bez enigma2.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+PYTHON_DIR = os.path.join(TOOLS_DIR, "..", "usr", "lib", "enigma2", "python")
+sys.path.insert(0, os.path.normpath(PYTHON_DIR))
+sys.path.insert(0, TOOLS_DIR)
+
+from Plugins.Extensions.CiefpSatelliteAnalyzer import backups, lamedb  # noqa: E402
+import lamedb_synth  # noqa: E402
+
+DEFAULT_SIZES = (1000, 10000, 100000, 500000)
+
+
+def consume(records):
+    count = 0
+    for _ in records:
+        count += 1
+    return count
+
+
+def cold_parse(path):
+    lamedb.invalidate_lamedb(path)
+    return len(lamedb.parse_lamedb(path).services)
+
+
+def snapshot_load(path):
+    return len(lamedb.load_snapshot(path).services)
+
+
+def cold_start(path):
+    # Prvo otvaranje ekrana posle restarta enigma2: prazan kes, snapshot na disku
+    lamedb.invalidate_lamedb(path)
+    return len(lamedb.load_lamedb(path).services)
+
+
+def busiest_orbital(model):
+    return max(model.orbital_counts, key=model.orbital_counts.get)
+
+
+def browse_orbital(path, orbital):
+    # DataBrowserScreen._load_transponders_for_orbital + _load_data_services_for_orbital + reload()
+    model = lamedb.load_lamedb(path)
+    tps = model.transponders_for_orbital(orbital)
+    infos = {}
+
+    def tp_info(key):
+        info = infos.get(key)
+        if info is None:
+            tp = model.transponders.get(key)
+            info = infos[key] = f"{tp.frequency} {tp.polarization} {tp.symbol_rate} {tp.fec}" if tp else ""
+        return info
+
+    services = model.services_for_orbital(orbital)
+    services.sort(key=lambda x: (tp_info(x.tp), x.name))
+    lines = []
+    for tp in tps:
+        lines.append(f"TP: {tp.tp_key}")
+        lines.append(f"   {tp_info(tp.key)}")
+        lines.append(f"   Params: {tp.full_params}")
+    for service in services:
+        lines.extend((service.ref, service.name, service.pline))
+        lines.extend(service.pids.split(" "))
+    return len(lines)
+
+
+def update_service(path, ref, state):
+    # LamedbEditorScreen.keySave: jedna izmena, jedna transakcija
+    state['n'] = state.get('n', 0) + 1
+    transaction = lamedb.LamedbTransaction(path)
+    transaction.update_service(ref, name="Benchmark edit %d" % state['n'])
+    transaction.commit()
+    return 1
+
+
+def batch_update(path, refs, state):
+    # Data Browser batch: 30 izmena servisa, jedan upis
+    state['n'] = state.get('n', 0) + 1
+    transaction = lamedb.LamedbTransaction(path)
+    for i, ref in enumerate(refs):
+        transaction.update_service(ref, name="Batch %d/%d" % (state['n'], i),
+                                   pline="p:Ciefp,c:151000,C:2600,f:4")
+    transaction.commit()
+    return len(refs)
+
+
+def confirm_save(path, state):
+    # AddFakeT2MIScreen.confirmSave: novi T2MI transponder + data servis
+    state['n'] = state.get('n', 0) + 1
+    n = state['n']
+    tp_key = "01860000:%04X:0000" % (0x3E00 + n)
+    tp_params = "11778000:15155000:0:3:390:2:0:1:1:0:2:255:0:0:0:4096"
+    ref = "%04x:01860000:%04x:0000:0c:0:0" % (n, 0x3E00 + n)
+
+    transaction = lamedb.LamedbTransaction(path)
+    transaction.put_transponder(tp_key, "s", tp_params)
+    transaction.insert_service(ref, "Fake T2MI %d" % n, "p:Ciefp,c:151000")
+    transaction.commit()
+    return 1
+
+
+def integrity(path):
+    report = lamedb.check_integrity(lamedb.load_lamedb(path))
+    return sum(len(e['orphans']) + len(e['unused']) + len(e['duplicates']) for e in report.values())
+
+
+def compact(path):
+    counts = lamedb.compact_lamedb(path)[1]
+    return counts['transponders'] + counts['services']
+
+
+def measure(label, func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"  {label:<26} {best * 1000:10.1f} ms {peak / 1048576.0:9.1f} MB   ({result})")
+    return best, peak
+
+
+def run_file(path, repeat, writable):
+    size = os.path.getsize(path)
+    print(f"{path}: {size} bytes, best of {repeat}")
+    print(f"  {'case':<26} {'wall':>13} {'peak mem':>12}")
+
+    measure("iter_lamedb (text)", lambda: consume(lamedb.iter_lamedb(path)), repeat)
+    measure("scan_lamedb (mmap)", lambda: consume(lamedb.scan_lamedb(path)), repeat)
+    parse_time = measure("parse_lamedb (cold)", lambda: cold_parse(path), repeat)[0]
+
+    model = lamedb.load_lamedb(path)
+    lamedb.save_snapshot(model)
+    measure("load_snapshot", lambda: snapshot_load(path), repeat)
+    start_time = measure("load_lamedb (cold start)", lambda: cold_start(path), repeat)[0]
+    print(f"  {'cold start vs parse':<26} {parse_time / start_time:10.1f} x"
+          f"   (snapshot {os.path.getsize(lamedb.snapshot_path(path))} bytes, lamedb {size} bytes)")
+    measure("load_lamedb (cached)", lambda: len(lamedb.load_lamedb(path).services), repeat)
+
+    orbital = busiest_orbital(lamedb.load_lamedb(path))
+    measure("browse orbital %d" % orbital, lambda: browse_orbital(path, orbital), repeat)
+    measure("check_integrity", lambda: integrity(path), repeat)
+
+    if writable:
+        ref = lamedb.load_lamedb(path).services_for_orbital(orbital)[0].ref
+        edit_state = {}
+        measure("_update_service_entry", lambda: update_service(path, ref, edit_state), repeat)
+        refs = [service.ref for service in lamedb.load_lamedb(path).services_for_orbital(orbital)[:30]]
+        batch_state = {}
+        measure("batch of %d edits" % len(refs), lambda: batch_update(path, refs, batch_state), repeat)
+        save_state = {}
+        measure("confirmSave (fake T2MI)", lambda: confirm_save(path, save_state), repeat)
+        measure("compact_lamedb", lambda: compact(path), 1)
+        start = time.perf_counter()
+        backups.wait_for_backups()
+        stored = backups.list_backups(path)
+        print(f"  {'backup store drain':<26} {(time.perf_counter() - start) * 1000:10.1f} ms"
+              f"   ({len(stored)} kept, {sum(b['size'] for b in stored)} bytes)")
+
+    lamedb.invalidate_lamedb(path)
+    try:
+        os.remove(lamedb.snapshot_path(path))
+    except OSError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="lamedb benchmark suite")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="broj servisa, odvojeno zarezom")
+    parser.add_argument("--format", choices=("4", "5", "both"), default="both")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--file", help="postojeca lamedb (meri se nad kopijom, fajl i snapshot pored njega se ne menjaju)")
+    parser.add_argument("--workdir", help="direktorijum za generisane fajlove (podrazumevano privremeni)")
+    args = parser.parse_args()
+
+    if args.file:
+        # Radi se nad kopijom: snapshot i kes se ne upisuju pored prave lamedb
+        workdir = tempfile.mkdtemp(prefix="lamedb_bench_")
+        try:
+            path = os.path.join(workdir, "lamedb")
+            shutil.copyfile(args.file, path)
+            print(f"{args.file} copied to {path}")
+            run_file(path, args.repeat, writable=False)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        return 0
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="lamedb_bench_")
+    versions = (4, 5) if args.format == "both" else (int(args.format),)
+    try:
+        for services in (int(s) for s in args.sizes.split(",") if s.strip()):
+            for version in versions:
+                path = os.path.join(workdir, "lamedb_%d_v%d" % (services, version))
+                start = time.perf_counter()
+                lamedb_synth.write_lamedb(path, services, version)
+                print(f"\n== {services} services, v{version} (generated in {time.perf_counter() - start:.1f} s)")
+                run_file(path, args.repeat, writable=True)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Generator sinteticke lamedb baze (v4 ili v5) za merenja van risivera:
+
+    python3 tools/lamedb_synth.py 100000 /tmp/lamedb [--format 5] [--seed 1]
+
+Servisi su rasporedjeni po ~40 orbitalnih pozicija (istok i zapad), sa
+realnim rasporedom TV/radio/data servisa, provider-a i CAID-ova; mali deo
+transpondera je T2MI (16 polja), DVB-T i DVB-C.
+"""
+import argparse
+import os
+import random
+import sys
+
+PYTHON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "usr", "lib", "enigma2", "python")
+sys.path.insert(0, os.path.normpath(PYTHON_DIR))
+
+from Plugins.Extensions.CiefpSatelliteAnalyzer.lamedb import params_to_v5  # noqa: E402
+
+ORBITALS = [30, 48, 70, 90, 100, 130, 160, 192, 200, 216, 235, 260, 282, 305, 315, 330, 360, 390, 420, 450,
+            530, 620, 685, 750, 800, 850, 900, 1000, 3300, 3330, 3380, 3450, 3530, 3550, 3560, 3592, 3594, 3597]
+PROVIDERS = ["ARD", "ZDFvision", "ORF", "Sky Deutschland", "CANAL+", "Movistar+", "BetaDigital", "RTL", "SES",
+             "Eutelsat", "Türksat", "Digi TV", "Total TV", "Polsat", "NOVA", "Arqiva", "MTV Networks", "BBC",
+             "M7 Group", "Telewizja Polska", "Bulsatcom", "ERT", "Hispasat", "Abertis", "Ciefp"]
+CAIDS = ["0b00", "0100", "0500", "0604", "0648", "098c", "09c4", "1830", "1833", "1702", "2600", "4aee", "0d96"]
+WORDS = ["News", "Sport", "Cinema", "Kids", "Music", "Doku", "Family", "Action", "Comedy", "History", "Nature",
+         "Info", "Život", "Noticias", "Haber", "Kino", "Série", "Ταινίες", "Дом", "Travel"]
+
+# (tip servisa kao sto ga plugin upisuje, udeo)
+SERVICE_TYPES = [("1", 50), ("19", 20), ("16", 5), ("1f", 3), ("2", 15), ("a", 2), ("c", 5)]
+
+
+def _weighted(rng, choices):
+    total = sum(w for _, w in choices)
+    pick = rng.uniform(0, total)
+    for value, weight in choices:
+        pick -= weight
+        if pick <= 0:
+            return value
+    return choices[-1][0]
+
+
+def generate(services, seed=1):
+    """-> (transponderi [(kljuc, prefix, parametri)], servisi [(header, ime, pline)])"""
+    rng = random.Random(seed)
+    transponders = []
+    result = []
+    per_tp = 12
+    tp_count = max(1, services // per_tp)
+
+    for t in range(tp_count):
+        kind = rng.random()
+        tsid = (t % 0xFFFF) + 1
+        onid = rng.randint(1, 0x2000)
+        if kind < 0.03:
+            ns = 0xEEEE0000
+            prefix = "t"
+            params = f"{rng.randint(21, 69) * 8000000 + 306000000}:0:{rng.randint(0, 5)}:{rng.randint(0, 5)}:" \
+                     f"{rng.randint(0, 4)}:{rng.randint(0, 2)}:{rng.randint(0, 4)}:0:2:0:{rng.randint(0, 1)}:0"
+        elif kind < 0.05:
+            ns = 0xFFFF0000
+            prefix = "c"
+            params = f"{rng.randint(114, 858) * 1000}:6900000:2:{rng.randint(3, 5)}:0:0:0"
+        else:
+            orbital = rng.choice(ORBITALS)
+            ns = (orbital << 16) | (rng.randint(0, 0xFF) if rng.random() < 0.2 else 0)
+            prefix = "s"
+            system = rng.randint(0, 1)
+            orb_field = orbital - 3600 if orbital > 1800 else orbital
+            params = f"{rng.randint(10700, 12750) * 1000}:{rng.choice([22000, 27500, 29900, 30000])}000:" \
+                     f"{rng.randint(0, 1)}:{rng.randint(1, 9)}:{orb_field}:2:0:{system}:{system + 1}:0:2"
+            if rng.random() < 0.02:
+                params += f":255:0:0:{rng.randint(0, 3)}:{rng.choice([4096, 4097, 4098])}"
+        transponders.append((f"{ns:08x}:{tsid:04x}:{onid:04x}", prefix, params))
+
+    for i in range(services):
+        key, _, _ = transponders[i % tp_count]
+        ns_h, tsid_h, onid_h = key.split(":")
+        sid = (i // tp_count) * 16 + rng.randint(1, 15)
+        stype = _weighted(rng, SERVICE_TYPES)
+        name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}"
+        if rng.random() < 0.3:
+            name += " HD"
+        tokens = [f"p:{rng.choice(PROVIDERS)}", f"c:00{rng.randint(0x20, 0x1FFF):04x}",
+                  f"c:01{rng.randint(0x20, 0x1FFF):04x}"]
+        if rng.random() < 0.35:
+            for caid in rng.sample(CAIDS, rng.randint(1, 3)):
+                tokens.append(f"C:{caid}")
+        if rng.random() < 0.1:
+            tokens.append("f:4")
+        result.append((f"{sid & 0xFFFF:04x}:{ns_h}:{tsid_h}:{onid_h}:{stype}:0", name, ",".join(tokens)))
+
+    # Malo "prljavih" zapisa, kao posle rucnih izmena: servisi bez TP-a i dupli ref-ovi
+    for i in range(max(1, services // 1000)):
+        result.append((f"{i + 1:04x}:00c00000:fff{i % 10:x}:0001:1:0", f"Orphan {i}", "p:Ciefp"))
+        result.append(result[rng.randrange(services)] if services else result[-1])
+    return transponders, result
+
+
+def write_v4(path, transponders, services):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("eDVB services /4/\ntransponders\n")
+        for key, prefix, params in transponders:
+            f.write(f"{key}\n\t{prefix} {params}\n/\n")
+        f.write("end\nservices\n")
+        for header, name, pline in services:
+            f.write(f"{header}\n{name}\n{pline}\n")
+        f.write("end\nHave a lot of bugs!\n")
+
+
+def write_v5(path, transponders, services):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("eDVB services /5/\n")
+        f.write("# Transponders: t:dvb_namespace:transport_stream_id:original_network_id,FEPARMS\n")
+        for key, prefix, params in transponders:
+            f.write(f"t:{key},{params_to_v5(prefix, params)}\n")
+        f.write("# Services: s:service_id:dvb_namespace:transport_stream_id:original_network_id:"
+                "service_type:service_number:source_id,\"service_name\"[,p:provider_name][,c:cached_pid]*"
+                "[,C:cached_capid]*[,f:flags]\n")
+        for header, name, pline in services:
+            f.write(f's:{header},"{name}",{pline}\n')
+
+
+def write_lamedb(path, services, version=4, seed=1):
+    transponders, records = generate(services, seed)
+    (write_v5 if version == 5 else write_v4)(path, transponders, records)
+    return len(transponders), len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic lamedb generator")
+    parser.add_argument("services", type=int, help="broj servisa (npr. 1000, 10000, 100000, 500000)")
+    parser.add_argument("output", help="izlazni fajl")
+    parser.add_argument("--format", type=int, choices=(4, 5), default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    tps, services = write_lamedb(args.output, args.services, args.format, args.seed)
+    print(f"{args.output}: v{args.format}, {tps} transponders, {services} services, "
+          f"{os.path.getsize(args.output)} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,14 +15,28 @@ from Components.Button import Button
 from Components.MenuList import MenuList
 from Components.MultiContent import MultiContentEntryText
 from Screens.Setup import Setup
-from Components.config import config, ConfigText, ConfigInteger, ConfigSelection
+from Components.config import config, ConfigText, ConfigInteger, ConfigSelection, ConfigSubsection, ConfigYesNo
 import os
-from enigma import eDVBDB
 import xml.etree.ElementTree as ET
 import urllib.parse
 import subprocess
 import time
 import re
+import threading
+from Plugins.Extensions.CiefpSatelliteAnalyzer.lamedb import load_lamedb, active_lamedb_path, \
+    check_integrity, compact_lamedb, restore_lamedb, record_base, edit_journal, LoadCancelled, \
+    LamedbTransaction, TransactionError, ConflictError, flush_snapshots_async, model_lock
+from Plugins.Extensions.CiefpSatelliteAnalyzer.backups import list_backups
+from Plugins.Extensions.CiefpSatelliteAnalyzer.dbreload import reload_scheduler, services_changed, bouquets_changed
+from Plugins.Extensions.CiefpSatelliteAnalyzer.fake_t2mi import build_records, import_files, read_table, plan_import, \
+    queue_import, TableError, T2MI_PID_MAX
+from Plugins.Extensions.CiefpSatelliteAnalyzer.query import compile_filter, FilterError
+from Plugins.Extensions.CiefpSatelliteAnalyzer.preload import preload_async, satellite_names
+
+config.plugins.CiefpSatelliteAnalyzer = ConfigSubsection()
+# Preload u zasebnim procesima (spawn); podrazumevano jedna pozadinska nit
+config.plugins.CiefpSatelliteAnalyzer.preload_processes = ConfigYesNo(default=False)
+
 
 class AstraAnalyzeScreen(Screen):
     skin = """
@@ -709,10 +723,17 @@ class DataBrowserScreen(Screen):
     </screen>
     """
 
-    def __init__(self, session, parent, orbital_pos):
+    # Delivery sistem (prefiks u lamedb-u) -> tuner_type iz frontendInfo
+    SYSTEM_NAMES = {"s": "DVB-S", "t": "DVB-T", "c": "DVB-C"}
+    T_BANDWIDTHS = {0: "8MHz", 1: "7MHz", 2: "6MHz", 3: "Auto", 4: "5MHz", 5: "1.712MHz", 6: "10MHz"}
+    T_MODULATIONS = {0: "QPSK", 1: "16QAM", 2: "64QAM", 3: "Auto", 4: "256QAM"}
+    C_MODULATIONS = {0: "Auto", 1: "16QAM", 2: "32QAM", 3: "64QAM", 4: "128QAM", 5: "256QAM"}
+
+    def __init__(self, session, parent, orbital_pos, system="s"):
         Screen.__init__(self, session)
         self.parent = parent
         self.orbital_pos = int(orbital_pos or 0)
+        self.system = system if system in self.SYSTEM_NAMES else "s"
 
         self["list"] = MenuList([])
         self["status"] = Label("Loading...")
@@ -722,22 +743,47 @@ class DataBrowserScreen(Screen):
         self["key_blue"]   = Button("Reload DB")  # opciono
 
         self["actions"] = ActionMap(
-            ["OkCancelActions", "DirectionActions", "ColorActions"],
+            ["OkCancelActions", "DirectionActions", "ColorActions", "MenuActions"],
             {
-                "cancel": self.close,
+                "cancel": self.keyExit,
+                "menu": self.openMenu,
                 "ok": self.openLamedbEditor,
                 "up": self["list"].up,
                 "down": self["list"].down,
                 "left": self["list"].pageUp,
                 "right": self["list"].pageDown,
-                "red": self.close,
+                "red": self.keyRed,
                 "green": self.openLamedbEditor,
                 "yellow": self.addFakeT2MI,
+                "blue": self.reload,
             },
             -2
         )
 
+        # Batch izmena (LamedbTransaction) dok korisnik ne uradi Commit iz menija
+        self.batch = None
+
+        # Rezultat pozadinskog učitavanja preuzima glavna nit preko tajmera
+        self._load_job = None
+        self.load_timer = eTimer()
+        self.load_timer.callback.append(self._loadProgress)
+        # Opisi transpondera za model na ekranu; koristi ih samo glavna nit
+        self._tp_infos = {}
+        self._tp_infos_model = None
+        # Rezultati filtera se dodaju u listu u delovima, dok stižu iz generatora
+        self._filter_run = None
+        self.filter_text = ""
+        self.filter_timer = eTimer()
+        self.filter_timer.callback.append(self._filterStep)
+
         self.onLayoutFinish.append(self.reload)
+        self.onClose.append(self._cancelLoad)
+        # Snapshot posle izmena iz ovog ekrana se upisuje jednom, pri zatvaranju
+        self.onClose.append(flush_snapshots_async)
+
+        # Trajanje zajednickog reload-a baze ide u statusnu liniju
+        reload_scheduler().listeners.append(self._reloadDone)
+        self.onClose.append(lambda: reload_scheduler().listeners.remove(self._reloadDone))
     REF_RE = re.compile(r"^[0-9a-fA-F]{4}:[0-9a-fA-F]{8}:[0-9a-fA-F]{4}:[0-9a-fA-F]{4}:[0-9a-fA-F]{2}:[0-9a-fA-F]+:0$")
 
     def _find_ref_index(self, items, start_idx):
@@ -820,7 +866,168 @@ class DataBrowserScreen(Screen):
         print("[Extract] No valid service found around index", selected_idx, "line:", line)
         return None
 
+    def openMenu(self):
+        choices = [
+            ("Filter services (e.g. stype=0x0c and caid=2600 and freq>11700)", "filter"),
+            ("Service query (CAID / provider)", "query"),
+            ("lamedb statistics", "stats"),
+            ("Integrity check (orphans / duplicates)", "integrity"),
+        ]
+        if self.batch is None:
+            choices.append(("Start batch edit (queue changes, one write)", "batch_start"))
+        else:
+            choices.append(("Commit %d queued changes (one write + reload)" % len(self.batch), "batch_commit"))
+            choices.append(("Discard queued changes", "batch_discard"))
+        if self.system == "s":
+            choices.append(("Import fake T2MI table (CSV / JSON)", "import"))
+        choices.append(("Restore lamedb from backup", "restore"))
+        self.session.openWithCallback(self.onMenuSelected, ChoiceBox, title="Data Browser", list=choices)
+
+    def onMenuSelected(self, choice):
+        if not choice:
+            return
+        if choice[1] == "filter":
+            self.openFilter()
+        elif choice[1] == "query":
+            self.session.open(ServiceQueryScreen, self.parent)
+        elif choice[1] == "stats":
+            self.session.open(LamedbStatsScreen, self.parent)
+        elif choice[1] == "integrity":
+            self.session.open(LamedbIntegrityScreen, self.parent)
+        elif choice[1] == "batch_start":
+            self.batch = LamedbTransaction(active_lamedb_path())
+            self["status"].setText("Batch edit: changes are queued until Commit (MENU)")
+        elif choice[1] == "batch_commit":
+            self.commitBatch()
+        elif choice[1] == "batch_discard":
+            self.batch = None
+            self["status"].setText("Batch edit: queued changes discarded")
+        elif choice[1] == "restore":
+            self.openRestore()
+        elif choice[1] == "import":
+            self.openImport()
+
+    def openImport(self):
+        """Masovni fake T2MI: tabela iz /tmp, /etc/enigma2 ili sa USB/HDD-a"""
+        files = import_files()
+        if not files:
+            self.session.open(MessageBox, "No .csv / .json files in /tmp, /etc/enigma2, /media/usb or /media/hdd.",
+                              MessageBox.TYPE_INFO, timeout=6)
+            return
+        self.session.openWithCallback(self.onImportSelected, ChoiceBox, title="Import fake T2MI table",
+                                      list=[(path, path) for path in files])
+
+    def onImportSelected(self, choice):
+        if not choice:
+            return
+        table = choice[1]
+        try:
+            records = plan_import(active_lamedb_path(), read_table(table), self.orbital_pos)
+        except TableError as e:
+            more = "\n... and %d more" % (len(e.errors) - 15) if len(e.errors) > 15 else ""
+            self.session.open(MessageBox, "Nothing imported:\n%s%s" % ("\n".join(e.errors[:15]), more),
+                              MessageBox.TYPE_ERROR)
+            return
+        except Exception as e:
+            self.session.open(MessageBox, "Import error:\n%s" % str(e), MessageBox.TYPE_ERROR)
+            return
+
+        preview = "\n".join("%s  %s" % (tp_key, name) for tp_key, _, _, name, _ in records[:12])
+        if len(records) > 12:
+            preview += "\n..."
+        self.session.openWithCallback(
+            lambda answer: answer and self.doImport(records, table),
+            MessageBox,
+            "Add %d fake T2MI transponders + services from %s?\n\n%s" % (len(records), os.path.basename(table), preview),
+            MessageBox.TYPE_YESNO
+        )
+
+    def doImport(self, records, table):
+        transaction = queue_import(self.batch if self.batch is not None else LamedbTransaction(active_lamedb_path()),
+                                   records)
+        if transaction is self.batch:
+            self["status"].setText("Batch edit: %d pending changes (import queued)" % len(transaction))
+            return
+        try:
+            bak = transaction.commit(label="Import %d fake T2MI from %s" % (len(records), os.path.basename(table)))
+        except TransactionError as e:
+            self.session.open(MessageBox, "Nothing imported:\n%s" % "\n".join(e.errors[:15]), MessageBox.TYPE_ERROR)
+            return
+        except Exception as e:
+            self.session.open(MessageBox, "Import error:\n%s" % str(e), MessageBox.TYPE_ERROR)
+            return
+        services_changed()
+        self.session.open(MessageBox, "Imported %d fake T2MI transponders in one write.\nBackup: %s" % (len(records), bak),
+                          MessageBox.TYPE_INFO, timeout=6)
+        self.reload()
+
+    def openRestore(self):
+        """Izbor backup-a iz backup store-a (najnoviji prvi)"""
+        stored = list_backups(active_lamedb_path())
+        if not stored:
+            self.session.open(MessageBox, "No lamedb backups yet.", MessageBox.TYPE_INFO, timeout=4)
+            return
+        choices = [("%s   %d KB   %s" % (time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(b['time'])),
+                                         b['size'] // 1024, b['hash'][:8]), b['path']) for b in stored]
+        self.session.openWithCallback(self.onRestoreSelected, ChoiceBox, title="Restore lamedb", list=choices)
+
+    def onRestoreSelected(self, choice):
+        if not choice:
+            return
+        self.session.openWithCallback(
+            lambda answer: answer and self.restoreBackup(choice[1]),
+            MessageBox,
+            "Replace lamedb with backup from %s?\nThe current lamedb is backed up first." % choice[0].split("   ")[0],
+            MessageBox.TYPE_YESNO
+        )
+
+    def restoreBackup(self, backup):
+        try:
+            restore_lamedb(active_lamedb_path(), backup)
+        except Exception as e:
+            self.session.open(MessageBox, "Restore error:\n%s" % str(e), MessageBox.TYPE_ERROR)
+            return
+        self.batch = None
+        services_changed()
+        self.session.open(MessageBox, "lamedb restored.", MessageBox.TYPE_INFO, timeout=4)
+        self.reload()
+
+    def commitBatch(self):
+        """Sve izmene iz batch-a: jedna provera, jedan upis, jedan reload baze"""
+        if not self.batch:
+            self.batch = None
+            return
+        count = len(self.batch)
+        try:
+            bak = self.batch.commit(label="Batch of %d changes" % count)
+        except TransactionError as e:
+            self.session.open(MessageBox, "Batch not saved:\n%s" % "\n".join(e.errors[:15]), MessageBox.TYPE_ERROR)
+            return
+        except Exception as e:
+            self.session.open(MessageBox, "Batch save error:\n%s" % str(e), MessageBox.TYPE_ERROR)
+            return
+        self.batch = None
+
+        services_changed()
+        self.session.open(MessageBox, "Saved %d changes in one write.\nBackup: %s" % (count, bak),
+                          MessageBox.TYPE_INFO, timeout=5)
+        self.reload()
+
+    def keyExit(self):
+        if self.batch:
+            self.session.openWithCallback(
+                lambda answer: answer and self.close(),
+                MessageBox,
+                "Discard %d queued changes?" % len(self.batch),
+                MessageBox.TYPE_YESNO
+            )
+            return
+        self.close()
+
     def addFakeT2MI(self):
+        if self.system != "s":
+            self.session.open(MessageBox, "Fake T2MI je samo za satelitske transpondere", MessageBox.TYPE_INFO, timeout=4)
+            return
         # Uzmi default iz aktivnog tunera
         default_freq = 11778
         default_sr = 15155
@@ -832,7 +1039,7 @@ class DataBrowserScreen(Screen):
                 if feData:
                     default_freq = feData.get("frequency", 11778000) // 1000
                     default_sr = feData.get("symbol_rate", 15155000) // 1000
-        self.session.open(AddFakeT2MIScreen, self.orbital_pos, default_freq, default_sr)
+        self.session.open(AddFakeT2MIScreen, self.orbital_pos, default_freq, default_sr, parent=self)
 
     def openLamedbEditor(self):
         # Uzmi podatke od selektovanog servisa (kao i ranije)
@@ -854,32 +1061,22 @@ class DataBrowserScreen(Screen):
             self.session.open(MessageBox, "Nema podataka o servisu!", MessageBox.TYPE_ERROR)
             return
 
-        # Dodaj TP podatke od AKTIVNOG tunera (ne od TP liste)
+        # TP podaci iz lamedb-a: kljuc namespace:tsid:onid iz ref-a servisa
         tp_data = None
-        service = self.session.nav.getCurrentService()
-        if service:
-            feInfo = service.frontendInfo()
-            if feInfo:
-                feData = feInfo.getAll(True)
-                if feData and feData.get("tuner_type") == "DVB-S":
-                    freq_khz = feData.get("frequency", 0) // 1000
-                    sr_khz   = feData.get("symbol_rate", 0) // 1000
-                    pol      = feData.get("polarization", 0)   # 0=H, 1=V
-                    fec      = feData.get("fec_inner", 0)
-                    orb      = feData.get("orbital_position", self.orbital_pos)
-                    inv      = feData.get("inversion", 2)
-                    sys      = feData.get("system", 1)         # 0=DVB-S, 1=DVB-S2
-                    mod      = feData.get("modulation", 1)     # 1=QPSK, 2=8PSK...
-                    ro       = feData.get("rolloff", 0)
-                    pilot    = feData.get("pilot", 2)
-
-                    tp_params = f"{freq_khz}:{sr_khz}:{pol}:{fec}:{orb}:{inv}:0:{sys}:{mod}:{ro}:{pilot}"
-                    tp_data = {
-                        'tp_key': f"{hex(freq_khz)[2:]}:{hex(feData.get('transponder_id', 0))[2:]}:ffff",  # približno
-                        'full_params': tp_params,
-                        'original_prefix': 's'  # standardno za satelit
-                    }
-                    print("[openLamedbEditor] Dodat TP od aktivnog tunera:", tp_params)
+        try:
+            parts = entry["ref"].split(":")
+            key = (int(parts[1], 16), int(parts[2], 16), int(parts[3], 16))
+        except (IndexError, ValueError):
+            key = None
+        model = self._load_model() if key else None
+        tp = model.transponders.get(key) if model else None
+        if tp is not None:
+            tp_data = {
+                'tp_key': "%08x:%04x:%04x" % key,
+                'full_params': tp.full_params,
+                'original_prefix': tp.prefix
+            }
+            print("[openLamedbEditor] TP iz lamedb:", tp_data['tp_key'], tp.full_params)
 
         # Otvori postojeći editor sa service + tp podacima
         self.session.open(LamedbEditorScreen, entry, tp_data, self)
@@ -959,17 +1156,239 @@ class DataBrowserScreen(Screen):
             pass
 
     def reload(self):
+        """Pokreće učitavanje u pozadinskoj niti; ekran ostaje upotrebljiv"""
+        self._cancelLoad()
+        job = {'lines': 0, 'matched': 0, 'cancel': False, 'done': False, 'result': None, 'error': None}
+        self._load_job = job
+        self["status"].setText("Loading...")
+        self["key_red"].setText("Stop")
+        threading.Thread(target=self._loadWorker, args=(job,), name="CiefpDataBrowser", daemon=True).start()
+        self.load_timer.start(200, False)
+
+    def _reloadDone(self, report):
+        if self._load_job is None:
+            self["status"].setText(report)
+
+    def _cancelLoad(self):
+        job = getattr(self, "_load_job", None)
+        if job is not None and not job['done']:
+            job['cancel'] = True
+        self._load_job = None
+        self.load_timer.stop()
+        self._filter_run = None
+        self.filter_timer.stop()
+
+    def keyRed(self):
+        """Crveno: prekida učitavanje ili filter koji je u toku, inače zatvara ekran"""
+        if self._filter_run is not None:
+            self._filterDone("stopped")
+            return
+        job = self._load_job
+        if job is None or job['done']:
+            self.keyExit()
+            return
+        self._cancelLoad()
+        self["key_red"].setText("Cancel")
+        self["status"].setText(f"Loading cancelled ({job['lines']} lines parsed, {job['matched']} services matched)")
+        self["list"].setList(["Loading cancelled - press Reload DB to load again"])
+        self.formatted_items = []
+
+    def _loadWorker(self, job):
+        # Pozadinska nit: bez pristupa widget-ima, rezultat ide u job
         try:
-            sat_txt = self.parent.formatOrbitalPos(self.orbital_pos) if hasattr(self.parent,
-                                                                                "formatOrbitalPos") else str(
-                self.orbital_pos)
-            # === NOVA LINIJA: Učitavamo i transpondere ===
-            tps = self._load_transponders_for_orbital(self.orbital_pos)
-            print(f"[DataBrowserScreen] Found {len(tps)} transponders")
+            job['result'] = self._buildItems(job)
+        except LoadCancelled:
+            print("[DataBrowserScreen] Loading cancelled")
+        except Exception as e:
+            print(f"[DataBrowserScreen] Error: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            job['error'] = e
+        job['done'] = True
+
+    def _loadProgress(self):
+        # Glavna nit (eTimer): napredak, pa preuzimanje gotovog rezultata
+        job = self._load_job
+        if job is None:
+            self.load_timer.stop()
+            return
+        if not job['done']:
+            if job.get('snapshot') and not job['lines']:
+                self["status"].setText("Loading snapshot...")
+            else:
+                self["status"].setText(f"Loading... {job['lines']} lines parsed, {job['matched']} services matched")
+            return
+        self.load_timer.stop()
+        self._load_job = None
+        self["key_red"].setText("Cancel")
+        if job['error'] is not None:
+            self["status"].setText("ERROR: %s" % str(job['error']))
+            self["list"].setList([f"ERROR: {str(job['error'])}"])
+        elif job['result'] is not None:
+            sat_txt, tps, items, formatted_items, model, infos = job['result']
+            # Opisi TP-ova koje je napravila pozadinska nit postaju kes glavne niti
+            self._tp_infos_model, self._tp_infos = model, infos
+            self._showItems(sat_txt, tps, items, formatted_items)
+
+    def _buildItems(self, job):
+        """
+        Parse i formatiranje (pozadinska nit)
+        -> (sat_txt, tps, items, formatted_items, model, opisi TP-ova)
+        """
+        # Jedno čitanje lamedb-a za transpondere i servise
+        model = self._load_model(job)
+        if job['cancel']:
+            raise LoadCancelled()
+        # Opisi TP-ova ove niti; glavna nit ih preuzima tek sa rezultatom
+        infos = {}
+        # Indeksi kesiranog modela se citaju pod lock-om (glavna nit ga menja posle upisa)
+        with model_lock():
+            if self.system == "s":
+                sat_txt = self.parent.formatOrbitalPos(self.orbital_pos) if hasattr(self.parent,
+                                                                                    "formatOrbitalPos") else str(
+                    self.orbital_pos)
+                tps = self._load_transponders_for_orbital(self.orbital_pos, model)
+                items = self._load_data_services_for_orbital(self.orbital_pos, model, infos)
+            else:
+                # DVB-T/C nemaju orbital; prikazuju se svi transponderi tog sistema
+                sat_txt = self.SYSTEM_NAMES[self.system]
+                tps = self._load_transponders_for_system(self.system, model)
+                items = self._load_services_for_system(self.system, model, infos)
+            for tp in tps:
+                self._tp_info(tp.key, model, infos)
+        print(f"[DataBrowserScreen] Found {len(tps)} transponders")
+        print(f"[DataBrowserScreen] Found {len(items)} items (services)")
+
+        if not items and not tps:
+            return sat_txt, tps, items, [], model, infos
+
+        # Formatiraj svaki red za prikaz
+        formatted_items = []
+
+        # === NOVI DEO: Prvo prikazujemo TRANSPO NDERE ===
+        if tps:
+            formatted_items.append("")
+            formatted_items.append(f"{'─' * 60} TRANSPONDERS ({len(tps)}) {'─' * 60}")
+            for tp in tps:
+                formatted_items.append(f"TP: {tp.tp_key}")
+                formatted_items.append(f"   {self._tp_info(tp.key, model, infos)}")
+                formatted_items.append(f"   Params: {tp.full_params}")
+                formatted_items.append("")  # razmak između TP-ova
+
+        # === POSTOJEĆI DEO: Servisi (grupisani po TP-ovima) ===
+        tp_services = {}
+        for service in items:
+            tp_services.setdefault(service.tp, []).append(service)
+
+        for key, services in tp_services.items():
+            if job['cancel']:
+                raise LoadCancelled()
+            # Prikaži liniju transpondera (kao ranije)
+            tp_info = self._tp_info(key, model, infos)
+            if tp_info:
+                formatted_items.append("")
+                formatted_items.append(f"{'─' * 100}")
+                formatted_items.append(f"TP: {services[0].tp_key} → {tp_info}")
+                formatted_items.append(f"{'─' * 100}")
+
+            # Prikaži servise za ovaj TP (kao ranije)
+            for service in services:
+                self._appendService(formatted_items, service)
+                job['matched'] += 1
+
+        if not formatted_items:
+            formatted_items = ["No data to display"]
+        return sat_txt, tps, items, formatted_items, model, infos
+
+    def _appendService(self, formatted_items, service):
+        """Blok servisa u listi: ref, ime, provider linija, PID-ovi (editor čita isti raspored)"""
+        provider = service.pline
+        formatted_items.append(f"{service.ref}")
+        formatted_items.append(f"{service.name or 'Unknown'}")
+        if provider and provider != "?" and provider != "Unknown":
+            formatted_items.append(f"{provider}")
+        for pid_line in service.pids.split(' '):
+            if pid_line:
+                formatted_items.append(f"{pid_line}")
+        formatted_items.append("")
+
+    # === Filter (query.py): kompajlira se jednom, rezultati stižu redom iz indeksa ===
+    def openFilter(self):
+        from Screens.VirtualKeyBoard import VirtualKeyBoard
+        text = self.filter_text
+        if not text:
+            # Predlog: filter počinje od trenutnog prikaza
+            if self.system == "s" and hasattr(self.parent, "formatOrbitalPos"):
+                text = f"pos={self.parent.formatOrbitalPos(self.orbital_pos)} and "
+            elif self.system != "s":
+                text = f"system={self.system} and "
+        self.session.openWithCallback(
+            self.applyFilter,
+            VirtualKeyBoard,
+            title="Filter: stype, caid, provider, name, pos, system, type, fta, freq, sr, pol, sid, tsid, onid",
+            text=text
+        )
 
-            items = self._load_data_services_for_orbital(self.orbital_pos)
-            print(f"[DataBrowserScreen] Found {len(items)} items (services)")
+    def applyFilter(self, text):
+        if not text or not text.strip():
+            return
+        try:
+            compiled = compile_filter(text)
+        except FilterError as e:
+            self.session.open(MessageBox, f"Filter error: {e}", MessageBox.TYPE_ERROR, timeout=8)
+            return
+        # Prvo prekid ucitavanja u pozadini, pa tek onda model za filter
+        self._cancelLoad()
+        model = self._load_model()
+        if model is None:
+            self["status"].setText("lamedb not found")
+            return
 
+        self.filter_text = compiled.text
+        self._filter_stats = {}
+        self._filter_model = model
+        self._filter_run = compiled.run(model, self._filter_stats)
+        self._filter_count = 0
+        self.formatted_items = []
+        self["list"].setList([])
+        self["key_red"].setText("Stop")
+        self.filter_timer.start(0, False)
+
+    def _filterStep(self):
+        # Jedan deo rezultata po otkucaju tajmera; lista raste dok generator radi
+        run = self._filter_run
+        if run is None:
+            self.filter_timer.stop()
+            return
+        model = self._filter_model
+        finished = True
+        for service in run:
+            self._filter_count += 1
+            self._appendService(self.formatted_items, service)
+            tp_info = self._tp_info(service.tp, model)
+            if tp_info:
+                self.formatted_items.insert(len(self.formatted_items) - 1, f"   {service.tp_key} → {tp_info}")
+            if self._filter_count % 200 == 0:
+                finished = False
+                break
+        self["list"].setList(self.formatted_items)
+        if finished:
+            self._filterDone("done")
+        else:
+            self["status"].setText(f"Filter: {self.filter_text} | {self._filter_count} matches so far...")
+
+    def _filterDone(self, state):
+        stats = self._filter_stats
+        self._filter_run = None
+        self.filter_timer.stop()
+        self["key_red"].setText("Cancel")
+        if not self.formatted_items:
+            self["list"].setList(["No services match the filter"])
+        self["status"].setText(f"Filter: {self.filter_text} | {self._filter_count} matches, {state} "
+                               f"({stats.get('plan', '')}: {stats.get('scanned', 0)} checked)")
+
+    def _showItems(self, sat_txt, tps, items, formatted_items):
+        try:
             if not items and not tps:
                 self["status"].setText(f"No services or transponders found for {sat_txt}")
                 self["list"].setList([f"No data found for {sat_txt}"])
@@ -977,62 +1396,9 @@ class DataBrowserScreen(Screen):
 
             self["status"].setText(f"Services + TPs on {sat_txt}: {len(items)} serv. + {len(tps)} TP")
 
-            # Formatiraj svaki red za prikaz
-            formatted_items = []
-
-            # === NOVI DEO: Prvo prikazujemo TRANSPO NDERE ===
-            if tps:
-                formatted_items.append("")
-                formatted_items.append(f"{'─' * 60} TRANSPONDERS ({len(tps)}) {'─' * 60}")
-                for tp in tps:
-                    formatted_items.append(f"TP: {tp['tp_key']}")
-                    formatted_items.append(f"   {tp['info']}")
-                    formatted_items.append(f"   Params: {tp['full_params']}")
-                    formatted_items.append("")  # razmak između TP-ova
-
-            # === POSTOJEĆI DEO: Servisi (grupisani po TP-ovima) ===
-            tp_services = {}
-            for service in items:
-                tp_key = service.get('tp_key', 'Unknown')
-                if tp_key not in tp_services:
-                    tp_services[tp_key] = []
-                tp_services[tp_key].append(service)
-
-            for tp_key, services in tp_services.items():
-                # Prikaži liniju transpondera (kao ranije)
-                if tp_key != 'Unknown':
-                    tp_info = services[0].get('tp_info', 'Unknown Transponder')
-                    if tp_info:
-                        formatted_items.append("")
-                        formatted_items.append(f"{'─' * 100}")
-                        formatted_items.append(f"TP: {tp_key} → {tp_info}")
-                        formatted_items.append(f"{'─' * 100}")
-
-                # Prikaži servise za ovaj TP (kao ranije)
-                for service in services:
-                    name = service.get('name', 'Unknown')
-                    ref = service.get('ref', '')
-                    pids = service.get('pids', '')
-                    provider = service.get('provider', '')
-
-                    formatted_items.append(f"{ref}")
-                    formatted_items.append(f"{name}")
-                    if provider and provider != "?" and provider != "Unknown":
-                        formatted_items.append(f"{provider}")
-                    if pids:
-                        for pid_line in pids.split(' '):
-                            if pid_line:
-                                formatted_items.append(f"{pid_line}")
-                    formatted_items.append("")
-
-            if not formatted_items:
-                formatted_items = ["No data to display"]
-
             self["list"].setList(formatted_items)
             self.formatted_items = formatted_items
 
-            # ... (ostatak metode za pomeranje selekcije - ostaje isti)
-
             moved = False
             # 1) Precizno: po service ref-u
             enigma_ref = self.getCurrentServiceRefString()
@@ -1060,252 +1426,439 @@ class DataBrowserScreen(Screen):
             self["status"].setText("ERROR: %s" % str(e))
             self["list"].setList([f"ERROR: {str(e)}"])
 
-    def namespace_to_orbital(self, ns_hex):
+    def _format_tp_info(self, tp):
+        if tp.prefix == "t":
+            bandwidth = "%dMHz" % (tp.bandwidth // 1000000) if tp.bandwidth > 100 \
+                else self.T_BANDWIDTHS.get(tp.bandwidth, "?")
+            modulation = self.T_MODULATIONS.get(tp.modulation, "N/A")
+            system = "DVB-T2" if tp.system == 1 else "DVB-T"
+            return f"{tp.frequency} MHz {bandwidth} {modulation} {system}"
+        if tp.prefix == "c":
+            fec = self.parent.getFec(tp.fec) if hasattr(self.parent, "getFec") else str(tp.fec)
+            modulation = self.C_MODULATIONS.get(tp.modulation, "N/A")
+            return f"{tp.frequency} MHz {tp.symbol_rate} {modulation} {fec} DVB-C"
+        freq = tp.frequency
+        sr = tp.symbol_rate
+        pol = {0: "H", 1: "V", 2: "L", 3: "R"}.get(tp.polarization, "?")
+        fec = self.parent.getFec(tp.fec) if hasattr(self.parent, "getFec") else str(tp.fec)
+        modulation = self.parent.getModulation(tp.modulation) if hasattr(self.parent, "getModulation") else str(tp.modulation)
+        system = "DVB-S2" if tp.system == 1 else "DVB-S"
+        return f"{freq} {pol} {sr} {fec} {modulation} {system}".strip()
+
+    def _tp_info(self, key, model, infos=None):
+        """
+        Opis transpondera, formatira se jednom po TP-u i modelu. Pozadinska nit
+        daje svoj infos dict; bez njega se koristi kes glavne niti.
+        """
+        if infos is None:
+            if self._tp_infos_model is not model:
+                self._tp_infos_model = model
+                self._tp_infos = {}
+            infos = self._tp_infos
+        info = infos.get(key)
+        if info is None:
+            tp = model.transponders.get(key) if model else None
+            info = infos[key] = self._format_tp_info(tp) if tp else ''
+        return info
+
+    def _load_model(self, stats=None):
+        lamedb_path = active_lamedb_path()
+        if not os.path.exists(lamedb_path):
+            print("[DataBrowserScreen] lamedb not found")
+            return None
         try:
-            ns_clean = ns_hex.lstrip('0').upper() if ns_hex else '0'
-            ns_int = int(ns_clean, 16)
-            orb_int = (ns_int >> 16) & 0xFFFF
-            if orb_int > 1800:
-                orb_int = 3600 - orb_int
-            return orb_int
-        except:
-            return -1
+            return load_lamedb(lamedb_path, stats)
+        except LoadCancelled:
+            raise
+        except Exception as e:
+            print(f"[DataBrowserScreen] Error reading lamedb: {e}")
+            return None
 
-    def _load_data_services_for_orbital(self, orbital_pos):
+    def _load_data_services_for_orbital(self, orbital_pos, model=None, infos=None):
         """Učitaj servise iz lamedb za dati orbital"""
-        lamedb = "/etc/enigma2/lamedb"
-        if not os.path.exists(lamedb):
-            print("[DataBrowserScreen] lamedb not found")
+        if model is None:
+            model = self._load_model()
+        if model is None:
             return []
 
+        orbital_pos = int(orbital_pos)
+        # Zapisi iz modela se vracaju direktno (bez kopiranja u dict)
+        services = model.services_for_orbital(orbital_pos)
+
+        print(f"[DataBrowserScreen] Total services: {len(model.services)}")
+        print(f"[DataBrowserScreen] Orbital match: {len(services)}")
+
+        # Sortiraj po transponder info pa po imenu
+        services.sort(key=lambda x: (self._tp_info(x.tp, model, infos), x.name))
+
+        return services
+
+    # === NOVA METODA: Učitavanje transpondera za aktivni satelit ===
+    def _load_transponders_for_orbital(self, orbital_pos, model=None):
+        """Učitava samo SATELITSKE transpondere iz lamedb-a za dati orbital"""
+        if model is None:
+            model = self._load_model()
+        if model is None:
+            return []
+
+        orbital_pos = int(orbital_pos)
+        # by_orbital indeks sadrži samo satelitske transpondere
+        tp_list = model.transponders_for_orbital(orbital_pos)
+
+        sat_name = self.parent.formatOrbitalPos(orbital_pos) if hasattr(self.parent, 'formatOrbitalPos') else f"{orbital_pos/10:.1f}°"
+        print(f"[DataBrowserScreen] Pronađeno {len(tp_list)} SATELITSKIH transpondera za {sat_name}")
+        return tp_list
+
+    def _load_transponders_for_system(self, system, model=None):
+        """Transponderi jednog delivery sistema ('t' ili 'c') iz lamedb-a"""
+        if model is None:
+            model = self._load_model()
+        if model is None:
+            return []
+        return model.transponders_for_system(system)
+
+    def _load_services_for_system(self, system, model=None, infos=None):
+        """Servisi na transponderima jednog delivery sistema, sortirani kao i satelitski"""
+        if model is None:
+            model = self._load_model()
+        if model is None:
+            return []
+        services = model.services_for_system(system)
+        services.sort(key=lambda x: (self._tp_info(x.tp, model, infos), x.name))
+        return services
+
+class LamedbStatsScreen(Screen):
+    """Zbirni pregled lamedb-a; brojevi dolaze gotovi iz kesiranog modela"""
+    skin = """
+    <screen name="LamedbStatsScreen" position="center,center" size="1800,900" title="..:: lamedb Statistics ::..">
+        <eLabel position="0,0" size="1800,900" backgroundColor="#0D1B36" zPosition="-1" />
+
+        <widget name="text" position="40,60" size="1720,760" font="Console;24"
+                foregroundColor="#ffffff" backgroundColor="#1a1a1a" />
+
+        <widget name="key_red" position="120,840" size="320,40" backgroundColor="red"
+                font="Bold;24" foregroundColor="#000000" halign="center" valign="center" />
+    </screen>
+    """
+
+    TOP_PROVIDERS = 30
+
+    def __init__(self, session, parent):
+        Screen.__init__(self, session)
+        self.parent = parent
+
+        self["text"] = ScrollLabel("Loading...")
+        self["key_red"] = Button("Close")
+
+        self["actions"] = ActionMap(
+            ["OkCancelActions", "DirectionActions", "ColorActions"],
+            {
+                "cancel": self.close,
+                "ok": self.close,
+                "red": self.close,
+                "up": self["text"].pageUp,
+                "down": self["text"].pageDown,
+                "left": self["text"].pageUp,
+                "right": self["text"].pageDown,
+            },
+            -2
+        )
+
+        self.onLayoutFinish.append(self.showStats)
+
+    def _orbitalText(self, orbital):
+        return self.parent.formatOrbitalPos(orbital) if hasattr(self.parent, "formatOrbitalPos") else str(orbital)
+
+    def showStats(self):
+        lamedb_path = active_lamedb_path()
         try:
-            with open(lamedb, "r", encoding="utf-8", errors="ignore") as f:
-                lines = [ln.rstrip() for ln in f]
-            print(f"[DataBrowserScreen] Read {len(lines)} lines from lamedb")
+            model = load_lamedb(lamedb_path) if os.path.exists(lamedb_path) else None
         except Exception as e:
-            print(f"[DataBrowserScreen] Error reading lamedb: {e}")
-            return []
+            print(f"[LamedbStatsScreen] Error reading lamedb: {e}")
+            model = None
+        if model is None:
+            self["text"].setText("lamedb not found")
+            return
 
-        # Prvo učitaj transpondere
-        tp_map = {}
-        i = 0
-        transponder_count = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            if line == "transponders":
-                i += 1
-                while i < len(lines) and lines[i].strip() != "/":
-                    key = lines[i].strip().lower()
-                    i += 1
-                    if i < len(lines) and lines[i].startswith("t "):
-                        p = lines[i][2:].split(":")
-                        if len(p) >= 5:
-                            # Format: t frequency:sr:polarization:fec:system:modulation:...
-                            freq = int(p[0]) // 1000 if p[0].isdigit() else 0
-                            sr = int(p[1]) // 1000 if p[1].isdigit() else 0
-                            pol = {"0": "H", "1": "V", "2": "L", "3": "R"}.get(p[2], "?")
-
-                            # Dohvati FEC
-                            fec_val = int(p[3]) if len(p) > 3 and p[3].isdigit() else 0
-                            fec = self.parent.getFec(fec_val) if hasattr(self.parent, "getFec") else str(fec_val)
-
-                            # Dohvati system i modulaciju
-                            system = "DVB-S"
-                            modulation = ""
-                            if len(p) > 5:
-                                system = "DVB-S2" if p[5] == "1" else "DVB-S"
-                                if len(p) > 6 and p[6].isdigit():
-                                    mod_val = int(p[6])
-                                    modulation = self.parent.getModulation(mod_val) if hasattr(self.parent,
-                                                                                               "getModulation") else str(
-                                        mod_val)
-
-                            tp_info = f"{freq} {pol} {sr} {fec} {modulation} {system}".strip()
-                            orb_str = p[4] if len(p) > 4 else "-1"
-                            orb = int(orb_str) if orb_str.isdigit() else -1
-                            tp_map[key] = {
-                                'orbital': orb,
-                                'info': tp_info
-                            }
-                            transponder_count += 1
-                    i += 1
-                continue
-            i += 1
-
-        print(f"[DataBrowserScreen] Found {transponder_count} transponders")
-
-        # Zatim učitaj servise
-        services = []
-        i = 0
-        service_count = 0
-        orbital_match_count = 0
-
-        while i < len(lines):
-            line = lines[i].strip()
-            if line == "services":
-                i += 1
-                while i < len(lines) and lines[i].strip() != "end":
-                    header = lines[i].strip()
-                    if not header or ":" not in header:
-                        i += 1
-                        continue
-
-                    fields = header.split(":")
-                    if len(fields) < 6:
-                        i += 1
-                        continue
-
-                    sid_h, ns_h, tsid_h, onid_h, stype_h, flags_h = fields[:6]
-                    try:
-                        sid = int(sid_h, 16)
-                        stype = int(stype_h, 16)
-                        flags = int(flags_h, 16) if flags_h else 0
-                    except:
-                        i += 1
-                        continue
+        lines = [
+            f"{lamedb_path} (v{model.version})",
+            "",
+            f"Services:      {len(model.services)}",
+            f"Transponders:  {len(model.transponders)}   " + "   ".join(
+                f"{DataBrowserScreen.SYSTEM_NAMES.get(k, k)}: {v}" for k, v in sorted(model.tp_counts.items())),
+            "",
+            "── Service type " + "─" * 40,
+            f"  TV:    {model.category_counts.get('tv', 0)}",
+            f"  Radio: {model.category_counts.get('radio', 0)}",
+            f"  Data:  {model.category_counts.get('data', 0)}",
+            "",
+            "── Services per position " + "─" * 31,
+        ]
+        for orbital, count in sorted(model.orbital_counts.items(), key=lambda x: self.parent.convertOrbitalPos(x[0])
+                                     if hasattr(self.parent, "convertOrbitalPos") else x[0]):
+            lines.append(f"  {self._orbitalText(orbital):>8}  {count}")
+        for system in ("t", "c"):
+            if model.system_counts.get(system):
+                lines.append(f"  {DataBrowserScreen.SYSTEM_NAMES[system]:>8}  {model.system_counts[system]}")
+
+        # CA sistemi: CAID-ovi istog sistema se sabiraju (servis sa vise CAID-ova se broji po CAID-u)
+        ca_systems = {}
+        for caid, services in model.by_caid.items():
+            name = (self.parent.getCaName(caid) if hasattr(self.parent, "getCaName") else None) or f"CAID {caid:04X}"
+            ca_systems[name] = ca_systems.get(name, 0) + len(services)
+        lines += ["", "── CA system " + "─" * 43, f"  {'Free / no CAID':<24} {model.fta_count}"]
+        for name, count in sorted(ca_systems.items(), key=lambda x: -x[1]):
+            lines.append(f"  {name:<24} {count}")
+
+        providers = sorted(model.by_provider.items(), key=lambda x: -len(x[1]))
+        lines += ["", f"── Providers ({len(providers)}, top {self.TOP_PROVIDERS}) " + "─" * 30]
+        for provider, services in providers[:self.TOP_PROVIDERS]:
+            lines.append(f"  {provider:<32} {len(services)}")
+
+        self["text"].setText("\n".join(lines))
+
+
+class LamedbIntegrityScreen(Screen):
+    """Servisi bez transpondera, transponderi bez servisa i dupli ref-ovi, po poziciji"""
+    skin = """
+    <screen name="LamedbIntegrityScreen" position="center,center" size="1800,900" title="..:: lamedb Integrity ::..">
+        <eLabel position="0,0" size="1800,900" backgroundColor="#0D1B36" zPosition="-1" />
 
-                    name = lines[i + 1].strip() if i + 1 < len(lines) else "?"
-                    provider = lines[i + 2].strip() if i + 2 < len(lines) else ""
+        <widget name="text" position="40,60" size="1720,720" font="Console;24"
+                foregroundColor="#ffffff" backgroundColor="#1a1a1a" />
 
-                    # Prikupi cached informacije (PID-ovi)
-                    cached = []
-                    j = i + 3
-                    while j < len(lines):
-                        if j >= len(lines):
-                            break
-                        cl = lines[j].strip()
-                        # Ako naiđemo na novi header (sadrži : i dovoljno polja), prekidamo
-                        if cl and ":" in cl and len(cl.split(":")) >= 6:
-                            break
-                        if cl.startswith(("p:", "c:", "C:", "f:")):
-                            cached.append(cl)
-                        j += 1
-                    i = j
+        <widget name="status" position="40,790" size="1720,40" font="Regular;22"
+                foregroundColor="#BBBBBB" halign="left" valign="center" transparent="1" />
+
+        <widget name="key_red" position="120,840" size="320,40" backgroundColor="red"
+                font="Bold;24" foregroundColor="#000000" halign="center" valign="center" />
+        <widget name="key_green" position="520,840" size="320,40" backgroundColor="green"
+                font="Bold;24" foregroundColor="#000000" halign="center" valign="center" />
+    </screen>
+    """
 
-                    service_count += 1
+    def __init__(self, session, parent):
+        Screen.__init__(self, session)
+        self.parent = parent
+        self.model = None
+        self.report = {}
 
-                    # Dohvati orbital iz transpondera
-                    ns_clean = ns_h.lstrip('0').lower() or '0'
-                    tp_key = f"{ns_clean}:{tsid_h}:{onid_h}"
-                    tp_data = tp_map.get(tp_key, {'orbital': -1, 'info': ''})
+        self["text"] = ScrollLabel("Checking...")
+        self["status"] = Label("")
+        self["key_red"] = Button("Close")
+        self["key_green"] = Button("Compact lamedb")
 
-                    if tp_data['orbital'] == -1:
-                        tp_data['orbital'] = self.namespace_to_orbital(ns_h)
+        self["actions"] = ActionMap(
+            ["OkCancelActions", "DirectionActions", "ColorActions"],
+            {
+                "cancel": self.close,
+                "ok": self.close,
+                "red": self.close,
+                "green": self.askCompact,
+                "up": self["text"].pageUp,
+                "down": self["text"].pageDown,
+                "left": self["text"].pageUp,
+                "right": self["text"].pageDown,
+            },
+            -2
+        )
 
-                    # Filter za aktivni orbital
-                    if tp_data['orbital'] != int(orbital_pos):
-                        continue
+        self.onLayoutFinish.append(self.runCheck)
 
-                    orbital_match_count += 1
+    def _groupText(self, group):
+        if group in DataBrowserScreen.SYSTEM_NAMES:
+            return DataBrowserScreen.SYSTEM_NAMES[group]
+        return self.parent.formatOrbitalPos(group) if hasattr(self.parent, "formatOrbitalPos") else str(group)
 
-                    # Formiraj referencu
-                    ref = f"{sid:04x}:{ns_h}:{tsid_h}:{onid_h}:{stype_h}:{flags_h}:0"
+    def _groupSortKey(self, group):
+        if group in DataBrowserScreen.SYSTEM_NAMES:
+            return (1, 0, group)
+        pos = self.parent.convertOrbitalPos(group) if hasattr(self.parent, "convertOrbitalPos") else group
+        return (0, pos, "")
 
-                    # Formiraj PID string - spojene sve cached linije
-                    pids_str = " ".join(cached) if cached else ""
+    def runCheck(self):
+        lamedb_path = active_lamedb_path()
+        try:
+            self.model = load_lamedb(lamedb_path) if os.path.exists(lamedb_path) else None
+        except Exception as e:
+            print(f"[LamedbIntegrityScreen] Error reading lamedb: {e}")
+            self.model = None
+        if self.model is None:
+            self["text"].setText("lamedb not found")
+            return
 
-                    services.append({
-                        'name': name,
-                        'ref': ref,
-                        'provider': provider if provider != "?" else "",
-                        'pids': pids_str,
-                        'tp_key': tp_key,
-                        'tp_info': tp_data['info'],
-                        'stype': stype,
-                        'flags': flags
-                    })
+        start = time.time()
+        self.report = check_integrity(self.model)
+        elapsed = time.time() - start
+
+        orphans = unused = duplicates = 0
+        lines = []
+        for group in sorted(self.report, key=self._groupSortKey):
+            entry = self.report[group]
+            orphans += len(entry['orphans'])
+            unused += len(entry['unused'])
+            duplicates += len(entry['duplicates'])
+            lines.append(f"{'─' * 20} {self._groupText(group)} {'─' * 20}")
+            for service in entry['orphans']:
+                lines.append(f"  ORPHAN   {service.ref}  {service.name}")
+            for tp in entry['unused']:
+                lines.append(f"  UNUSED   TP {tp.tp_key}  {tp.full_params}")
+            for services in entry['duplicates']:
+                lines.append(f"  DUP x{len(services)}   {services[0].ref}  " + " / ".join(x.name for x in services))
+            lines.append("")
+
+        self["text"].setText("\n".join(lines) if lines else "lamedb is clean: no orphans, unused transponders or duplicates.")
+        self["status"].setText(f"{orphans} orphan services, {unused} unused TPs, {duplicates} duplicate refs "
+                               f"({len(self.model.services)} services checked in {elapsed * 1000:.0f} ms)")
+
+    def askCompact(self):
+        if not self.report:
+            self.session.open(MessageBox, "Nothing to compact.", MessageBox.TYPE_INFO, timeout=4)
+            return
+        self.session.openWithCallback(
+            self.doCompact,
+            MessageBox,
+            "Remove orphan services, unused transponders and duplicate refs from lamedb?\n"
+            "A backup of the current file is kept.",
+            MessageBox.TYPE_YESNO
+        )
 
-                break
-            i += 1
+    def doCompact(self, confirmed):
+        if not confirmed:
+            return
+        try:
+            bak, counts = compact_lamedb(active_lamedb_path())
+            services_changed()
+            self.session.open(
+                MessageBox,
+                "lamedb compacted: removed %d transponders, %d services.\nBackup: %s"
+                % (counts['transponders'], counts['services'], bak),
+                MessageBox.TYPE_INFO,
+                timeout=8
+            )
+        except Exception as e:
+            self.session.open(MessageBox, "Compact error:\n%s" % str(e), MessageBox.TYPE_ERROR)
+        self.runCheck()
 
-        print(f"[DataBrowserScreen] Total services: {service_count}")
-        print(f"[DataBrowserScreen] Orbital match: {orbital_match_count}")
-        print(f"[DataBrowserScreen] After filter: {len(services)}")
 
-        # Sortiraj po transponder info pa po imenu
-        services.sort(key=lambda x: (x['tp_info'], x['name']))
+class ServiceQueryScreen(Screen):
+    """Upiti preko svih satelita: servisi po CAID-u (C:) ili provideru (p:)"""
+    skin = """
+    <screen name="ServiceQueryScreen" position="center,center" size="1800,900" title="..:: Service Query ::..">
+        <eLabel position="0,0" size="1800,900" backgroundColor="#0D1B36" zPosition="-1" />
 
-        return services
+        <widget name="list" position="40,60" size="1720,720" scrollbarMode="showOnDemand"
+                foregroundColor="#ffffff" backgroundColor="#1a1a1a" font="Console;24" />
 
-    # === NOVA METODA: Učitavanje transpondera za aktivni satelit ===
-    def _load_transponders_for_orbital(self, orbital_pos):
-        """Učitava samo SATELITSKE transpondere iz lamedb-a za dati orbital"""
-        lamedb = "/etc/enigma2/lamedb"
-        if not os.path.exists(lamedb):
-            print("[DataBrowserScreen] lamedb not found")
-            return []
+        <widget name="status" position="40,790" size="1720,40" font="Regular;22"
+                foregroundColor="#BBBBBB" halign="left" valign="center" transparent="1" />
+
+        <widget name="key_red" position="120,840" size="320,40" backgroundColor="red"
+                font="Bold;24" foregroundColor="#000000" halign="center" valign="center" />
+        <widget name="key_green" position="520,840" size="320,40" backgroundColor="green"
+                font="Bold;24" foregroundColor="#000000" halign="center" valign="center" />
+        <widget name="key_yellow" position="920,840" size="320,40" backgroundColor="yellow"
+                font="Bold;24" foregroundColor="#000000" halign="center" valign="center" />
+    </screen>
+    """
+
+    def __init__(self, session, parent):
+        Screen.__init__(self, session)
+        self.parent = parent
+        self.model = None
+
+        self["list"] = MenuList([])
+        self["status"] = Label("Loading...")
+        self["key_red"] = Button("Close")
+        self["key_green"] = Button("By CAID")
+        self["key_yellow"] = Button("By Provider")
 
+        self["actions"] = ActionMap(
+            ["OkCancelActions", "DirectionActions", "ColorActions"],
+            {
+                "cancel": self.close,
+                "ok": self.close,
+                "red": self.close,
+                "green": self.selectCaid,
+                "yellow": self.selectProvider,
+                "up": self["list"].up,
+                "down": self["list"].down,
+                "left": self["list"].pageUp,
+                "right": self["list"].pageDown,
+            },
+            -2
+        )
+
+        self.onLayoutFinish.append(self.loadModel)
+
+    def loadModel(self):
+        lamedb_path = active_lamedb_path()
         try:
-            with open(lamedb, "r", encoding="utf-8", errors="ignore") as f:
-                lines = [ln.rstrip() for ln in f]
+            self.model = load_lamedb(lamedb_path) if os.path.exists(lamedb_path) else None
         except Exception as e:
-            print(f"[DataBrowserScreen] Error reading lamedb: {e}")
-            return []
+            print(f"[ServiceQueryScreen] Error reading lamedb: {e}")
+            self.model = None
+        if self.model is None:
+            self["status"].setText("lamedb not found")
+            return
+        self["status"].setText(f"{len(self.model.services)} services, {len(self.model.by_caid)} CAIDs, "
+                               f"{len(self.model.by_provider)} providers | Green: CAID, Yellow: provider")
+
+    def _caName(self, caid):
+        return (self.parent.getCaName(caid) if hasattr(self.parent, "getCaName") else None) or ""
+
+    def selectCaid(self):
+        if not self.model or not self.model.by_caid:
+            return
+        choices = []
+        for caid in sorted(self.model.by_caid):
+            choices.append((f"C:{caid:04X}  {self._caName(caid)}  ({len(self.model.by_caid[caid])})", caid))
+        self.session.openWithCallback(self.caidSelected, ChoiceBox, title="Select CAID", list=choices)
+
+    def selectProvider(self):
+        if not self.model or not self.model.by_provider:
+            return
+        choices = []
+        for provider in sorted(self.model.by_provider, key=str.lower):
+            choices.append((f"{provider}  ({len(self.model.by_provider[provider])})", provider))
+        self.session.openWithCallback(self.providerSelected, ChoiceBox, title="Select provider", list=choices)
+
+    def caidSelected(self, choice):
+        if choice:
+            caid = choice[1]
+            self.showResults(f"C:{caid:04X} {self._caName(caid)}".strip(), self.model.services_for_caid(caid))
+
+    def providerSelected(self, choice):
+        if choice:
+            self.showResults(f"p:{choice[1]}", self.model.services_for_provider(choice[1]))
+
+    def _groupLabel(self, service):
+        system = self.model.system_for(service.tp)
+        if system != "s":
+            return (1, system), DataBrowserScreen.SYSTEM_NAMES.get(system, system)
+        orbital = service.orbital
+        label = self.parent.formatOrbitalPos(orbital) if hasattr(self.parent, "formatOrbitalPos") else str(orbital)
+        return (0, orbital), label
+
+    def showResults(self, title, services):
+        # Rezultat dolazi direktno iz indeksa; ovde se samo grupiše po poziciji
+        groups = {}
+        for service in services:
+            key, label = self._groupLabel(service)
+            groups.setdefault(key, (label, []))[1].append(service)
+
+        items = []
+        for key in sorted(groups):
+            label, group = groups[key]
+            items.append(f"{'─' * 20} {label} ({len(group)}) {'─' * 20}")
+            for service in sorted(group, key=lambda x: x.name):
+                items.append(f"{service.ref}  {service.name}  [{service.tp_key}]")
+            items.append("")
+
+        self["list"].setList(items or ["No services found"])
+        self["status"].setText(f"{title}: {len(services)} services on {len(groups)} positions")
 
-        tp_list = []
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            if line and ':' in line and len(line.split(':')) == 3:
-                key = line.strip().upper()  # npr. 01860000:03EA:FFFF
-                i += 1
-                if i < len(lines):
-                    tp_line = lines[i].strip()
-                    if tp_line.startswith(('s ', 't ')):  # podržavamo i s i t, ali filtriramo kasnije
-                        params_str = tp_line[2:]
-                        p = params_str.split(':')
-
-                        if len(p) < 5:
-                            i += 1
-                            continue
-
-                        # Orbital position je NA INDEXU 4 !!!
-                        try:
-                            orb = int(p[4])
-                        except (ValueError, IndexError):
-                            i += 1
-                            continue
-
-                        # Preskoči ako nije traženi orbital
-                        if orb != int(orbital_pos):
-                            i += 1
-                            continue
-
-                        # Ovo je validan satelitski TP za traženi satelit
-                        freq = int(p[0]) // 1000 if p[0].isdigit() else 0
-                        sr   = int(p[1]) // 1000 if len(p) > 1 and p[1].isdigit() else 0
-                        pol  = {"0":"H", "1":"V", "2":"L", "3":"R"}.get(p[2] if len(p)>2 else "0", "?")
-                        fec_val = int(p[3]) if len(p)>3 and p[3].isdigit() else 0
-                        fec  = self.parent.getFec(fec_val) if hasattr(self.parent, 'getFec') else str(fec_val)
-
-                        # Sistem / modulacija
-                        sys_str = "DVB-S"
-                        if len(p) > 7 and p[7] == "1":
-                            sys_str = "DVB-S2"
-                        elif "8PSK" in params_str or "16APSK" in params_str or "32APSK" in params_str:
-                            sys_str = "DVB-S2"
-
-                        tp_info = f"{freq:5} {pol} {sr:5}  {fec}  {sys_str}"
-
-                        tp_list.append({
-                            'tp_key': key,
-                            'info': tp_info.strip(),
-                            'full_params': params_str,
-                            'orbital': orb,
-                            'system': sys_str
-                        })
-
-                        print(f"[TP ADD] {key} → {tp_info}  (orbital={orb})")
-
-            i += 1
-
-        # Sort po frekvenciji (po namespace delu ključa)
-        tp_list.sort(key=lambda x: int(x['tp_key'].split(':')[0], 16) if ':' in x['tp_key'] else 0)
 
-        sat_name = self.parent.formatOrbitalPos(orbital_pos) if hasattr(self.parent, 'formatOrbitalPos') else f"{orbital_pos/10:.1f}°"
-        print(f"[DataBrowserScreen] Pronađeno {len(tp_list)} SATELITSKIH transpondera za {sat_name}")
-        return tp_list
-    
 class LamedbEditorScreen(Screen):
     skin = """
     <screen name="LamedbEditorScreen" position="center,center" size="1800,900" title="..:: Lamedb Editor ::..">
@@ -1328,8 +1881,6 @@ class LamedbEditorScreen(Screen):
     </screen>
     """
 
-    LAMEDB_PATH = "/etc/enigma2/lamedb"
-
     def __init__(self, session, entry, tp_data=None, parent=None):
         """
         entry = {"ref": "...", "name": "...", "pline": "..."}
@@ -1338,6 +1889,7 @@ class LamedbEditorScreen(Screen):
         """
         Screen.__init__(self, session)
         self.parent = parent
+        self.lamedb_path = active_lamedb_path()  # lamedb5 ako postoji
         self.original_ref = (entry.get("ref") or "").strip()
         self.ref = self.original_ref
         self.name = (entry.get("name") or "").strip()
@@ -1374,6 +1926,9 @@ class LamedbEditorScreen(Screen):
 
         self._parse_pline_to_custom(self.pline)
 
+        # Verzija zapisa koju korisnik menja; po njoj commit prepoznaje izmene enigma2 u medjuvremenu
+        self._captureBase()
+
         self["list"] = MenuList([])
         self["status"] = Label("")
         self["key_red"] = Button("Cancel")
@@ -1382,10 +1937,11 @@ class LamedbEditorScreen(Screen):
         self["key_blue"] = Button("Reload DB")
 
         self["actions"] = ActionMap(
-            ["OkCancelActions", "ColorActions", "DirectionActions"],
+            ["OkCancelActions", "ColorActions", "DirectionActions", "MenuActions"],
             {
                 "cancel": self.keyCancel,
                 "ok": self.keyOK,
+                "menu": self.openJournal,
                 "red": self.keyCancel,
                 "green": self.keySave,
                 "yellow": self.toggleMode,
@@ -1399,6 +1955,9 @@ class LamedbEditorScreen(Screen):
         )
 
         self.onLayoutFinish.append(self.refreshList)
+        self.onClose.append(flush_snapshots_async)
+        reload_scheduler().listeners.append(self._reloadDone)
+        self.onClose.append(lambda: reload_scheduler().listeners.remove(self._reloadDone))
 
     def _sidLineEdited(self, text):
         if text:
@@ -1489,7 +2048,7 @@ class LamedbEditorScreen(Screen):
         # Postavi listu
         self["list"].setList(items)
 
-        self["status"].setText("OK=Edit | Green=Save | Yellow=Mode | Blue=Reload DB")
+        self["status"].setText("OK=Edit | Green=Save | Yellow=Mode | Blue=Reload DB | Menu=Undo/Redo")
 
     def _getSelectedLine(self):
         try:
@@ -2069,20 +2628,37 @@ class LamedbEditorScreen(Screen):
                 self.session.open(MessageBox, "Missing original ref!", MessageBox.TYPE_ERROR)
                 return
 
-            bak = self._update_service_entry(
-                ref_old=self.original_ref,
-                ref_new=ref_new,
-                name_new=name_new,
-                pline_new=pline_new
-            )
-            # Sačuvaj TP ako postoji i promenjen
+            if not os.path.exists(self.lamedb_path):
+                raise Exception("lamedb not found: %s" % self.lamedb_path)
+
+            transaction = self._transaction()
+            transaction.update_service(self.original_ref, ref_new, name_new, pline_new, base=self.service_base)
+            # Sačuvaj TP ako postoji i promenjen (isti upis kao i servis)
             if self.tp_data and ':'.join(self.edited_tp_params) != self.original_tp_params:
-                self._update_transponder_entry(
-                    tp_key=self.tp_data['tp_key'],
-                    new_params=':'.join(self.edited_tp_params),
-                    prefix=self.tp_data['original_prefix']
+                transaction.update_transponder(
+                    self.tp_data['tp_key'],
+                    self.tp_data['original_prefix'],
+                    ':'.join(self.edited_tp_params),
+                    base=self.tp_base
                 )
 
+            if transaction is getattr(self.parent, "batch", None):
+                # Batch iz Data Browser-a: upis i reload tek na Commit
+                self["status"].setText("Queued: %d pending changes" % len(transaction))
+                self.session.open(
+                    MessageBox,
+                    "Queued (%d pending changes).\nCommit from Data Browser MENU." % len(transaction),
+                    MessageBox.TYPE_INFO,
+                    timeout=5
+                )
+                return
+
+            bak = transaction.commit(label="Edit %s" % name_new)
+            # Sledeci Save se zasniva na upravo upisanom stanju
+            self.original_ref = ref_new
+            self.original_tp_params = ':'.join(self.edited_tp_params)
+            self._captureBase()
+
             self.session.open(
                 MessageBox,
                 "Saved!\nBackup: %s" % bak,
@@ -2098,93 +2674,99 @@ class LamedbEditorScreen(Screen):
             except:
                 pass
 
+        except ConflictError as e:
+            self.session.open(MessageBox, "Not saved, lamedb was changed meanwhile:\n%s" % "\n".join(e.errors),
+                              MessageBox.TYPE_ERROR)
         except Exception as e:
             self.session.open(MessageBox, "Save error:\n%s" % str(e), MessageBox.TYPE_ERROR)
 
-    def reloadE2DB(self):
+    def openJournal(self):
+        """Undo/redo upisa iz ove sesije (samo izmenjeni zapisi, bez kopije lamedb-a)"""
+        journal = edit_journal(self.lamedb_path)
+        choices = []
+        for entry in reversed(journal.undo_stack):
+            choices.append(("Undo: %s (%s)" % (entry.label, time.strftime("%H:%M:%S", time.localtime(entry.time))),
+                            "undo"))
+            break
+        for entry in reversed(journal.redo_stack):
+            choices.append(("Redo: %s" % entry.label, "redo"))
+            break
+        if not choices:
+            self.session.open(MessageBox, "Nothing to undo.", MessageBox.TYPE_INFO, timeout=4)
+            return
+        title = "Undo %d / Redo %d steps" % (len(journal.undo_stack), len(journal.redo_stack))
+        self.session.openWithCallback(self.onJournalSelected, ChoiceBox, title=title, list=choices)
+
+    def onJournalSelected(self, choice):
+        if not choice:
+            return
+        undo = choice[1] == "undo"
+        journal = edit_journal(self.lamedb_path)
         try:
-            from enigma import eDVBDB
-            db = eDVBDB.getInstance()
-            if db:
-                try:
-                    db.reloadServicelist()
-                except:
-                    pass
-                try:
-                    db.reloadBouquets()
-                except:
-                    pass
-            self["status"].setText("Reload DB: OK")
+            entry = journal.undo() if undo else journal.redo()
+        except TransactionError as e:
+            self.session.open(MessageBox, "%s failed:\n%s" % ("Undo" if undo else "Redo", "\n".join(e.errors[:15])),
+                              MessageBox.TYPE_ERROR)
+            return
         except Exception as e:
-            self["status"].setText("Reload DB error: %s" % str(e))
-
-    # ---------------- lamedb IO helpers ----------------
-
-    def _backup_path(self):
-        return self.LAMEDB_PATH + ".bak_" + time.strftime("%Y%m%d_%H%M%S")
-
-    def _read_lines_keep_nl(self):
-        with open(self.LAMEDB_PATH, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read().splitlines(True)  # keep \n
-
-    def _write_atomic_with_backup(self, lines):
-        bak = self._backup_path()
-
-        # backup
-        with open(bak, "w", encoding="utf-8", errors="ignore") as f:
-            f.writelines(lines)
-
-        tmp = "/etc/enigma2/.lamedb.tmp"
-        with open(tmp, "w", encoding="utf-8", errors="ignore") as f:
-            f.writelines(lines)
-
-        os.rename(tmp, self.LAMEDB_PATH)
-        return bak
-
-    def _update_transponder_entry(self, tp_key, new_params, prefix='s'):
-        lines = self._read_lines_keep_nl()
-        in_trans = False
-        current_key = None
-        for i, ln in enumerate(lines):
-            stripped = ln.strip()
-            if stripped == "transponders":
-                in_trans = True
-            elif stripped == "end":
-                in_trans = False
-            if in_trans:
-                if ':' in stripped and len(stripped.split(':')) == 3:
-                    current_key = stripped.upper()
-                elif current_key == tp_key and stripped.startswith(('s ', 't ')):
-                    lines[i] = f"{prefix} {new_params}\n"
-                    break
-        self._write_atomic_with_backup(lines)
-
-    def _update_service_entry(self, ref_old, ref_new=None, name_new=None, pline_new=None):
-        if not os.path.exists(self.LAMEDB_PATH):
-            raise Exception("lamedb not found: %s" % self.LAMEDB_PATH)
-
-        lines = self._read_lines_keep_nl()
-        target = ref_old.strip()
-
-        idx = None
-        for i, ln in enumerate(lines):
-            if ln.strip() == target:
-                idx = i
-                break
-        if idx is None:
-            raise Exception("Service ref not found in lamedb: %s" % target)
+            self.session.open(MessageBox, "%s error:\n%s" % ("Undo" if undo else "Redo", str(e)), MessageBox.TYPE_ERROR)
+            return
 
-        if idx + 2 >= len(lines):
-            raise Exception("Invalid lamedb structure around service (need 3 lines)")
+        self._followJournal(entry, undo)
+        self.reloadE2DB()
+        try:
+            if self.parent and hasattr(self.parent, "reload"):
+                self.parent.reload()
+        except:
+            pass
+        self["status"].setText("%s: %s" % ("Undone" if undo else "Redone", entry.label))
+
+    def _followJournal(self, entry, undo):
+        """Ako undo/redo menja servis iz editora, polja prelaze na njegovo novo stanje"""
+        found, fields = entry.follow(self.original_ref, undo)
+        if found and fields is None:
+            self.session.open(MessageBox, "This service no longer exists after %s." % ("undo" if undo else "redo"),
+                              MessageBox.TYPE_INFO, timeout=5)
+        elif found:
+            header, self.name, self.pline = fields
+            self.original_ref = self.ref = self.sid_line = header
+            self._parse_sid_line(self.sid_line)
+            self._parse_pline_to_custom(self.pline)
+        if self.tp_data:
+            tp = load_lamedb(self.lamedb_path).transponders.get(self._tpKey())
+            if tp is not None:
+                self.original_tp_params = tp.full_params
+                self.edited_tp_params = tp.full_params.split(':')
+        self._captureBase()
+        self.refreshList()
+
+    def _tpKey(self):
+        try:
+            return tuple(int(part, 16) for part in self.tp_data.get('tp_key', '').split(':'))
+        except ValueError:
+            return None
+
+    def _captureBase(self):
+        try:
+            self.service_base = record_base(self.lamedb_path, "s", self.original_ref) if self.original_ref else None
+            tp_key = self.tp_data.get('tp_key')
+            self.tp_base = record_base(self.lamedb_path, "t", tp_key) if tp_key else None
+        except Exception as e:
+            print("[Editor] Could not read record base:", e)
+            self.service_base = self.tp_base = None
+
+    def reloadE2DB(self):
+        # Zajednicki scheduler: vise Save-ova zaredom daje jedan reload
+        services_changed()
+        self["status"].setText("Reload DB scheduled")
 
-        if ref_new is not None:
-            lines[idx] = ref_new.rstrip("\n") + "\n"
-        if name_new is not None:
-            lines[idx + 1] = name_new.rstrip("\n") + "\n"
-        if pline_new is not None:
-            lines[idx + 2] = pline_new.rstrip("\n") + "\n"
+    def _reloadDone(self, report):
+        self["status"].setText(report)
 
-        return self._write_atomic_with_backup(lines)
+    def _transaction(self):
+        """Batch transakcija Data Browser-a ako je uključena, inače nova (upis odmah)"""
+        batch = getattr(self.parent, "batch", None)
+        return batch if batch is not None else LamedbTransaction(self.lamedb_path)
 
 
 class AddFakeT2MIScreen(Setup):
@@ -2196,11 +2778,12 @@ class AddFakeT2MIScreen(Setup):
     </screen>
     """
 
-    def __init__(self, session, orbital_pos=390, default_freq=11778, default_sr=15155):
+    def __init__(self, session, orbital_pos=390, default_freq=11778, default_sr=15155, parent=None):
         self.skinName = "AddFakeT2MIScreen"
         Setup.__init__(self, session=session, setup="addfaket2mi")
 
         self.orbital_pos = orbital_pos
+        self.parent = parent
 
         # Config polja sa opcijom za tip kanala
         self.config_list = [
@@ -2214,7 +2797,7 @@ class AddFakeT2MIScreen(Setup):
             ("Modulation", ConfigSelection(default="1",
                                            choices=[("1", "QPSK"), ("2", "8PSK"), ("3", "QAM16"), ("4", "16APSK"),
                                                     ("5", "32APSK")])),
-            ("T2MI PID", ConfigInteger(default=4096, limits=(0, 8192))),
+            ("T2MI PID", ConfigInteger(default=4096, limits=(0, T2MI_PID_MAX))),
             ("PLP", ConfigInteger(default=0, limits=(0, 255))),
             ("Channel Type", ConfigSelection(default="data", choices=[
                 ("data", "Data (0x0C)"),
@@ -2266,38 +2849,15 @@ class AddFakeT2MIScreen(Setup):
         caid = self.config_list[12][1].value.strip()
         flags = self.config_list[13][1].value
 
-        # Mapiraj tip kanala na hex vrednost
-        type_map = {
-            "data": "0c",  # Data service
-            "tv_sd": "01",  # TV SD
-            "tv_hd": "19"  # TV HD
-        }
-        stype = type_map.get(channel_type, "0c")
-
-        # Generiši TP key
-        freq_hex = format(freq_mhz, '04x')
-        ns_hex = f"0186{freq_hex}"
-        tsid_hex = "03ea"
-        onid_hex = "0000"
-
-        tp_key = f"{ns_hex}:{tsid_hex}:{onid_hex}".upper()
-
-        # Generiši TP params
-        tp_params = (
-            f"{freq_mhz * 1000}:{sr_ksym * 1000}:{pol}:{fec}:{self.orbital_pos}:"
-            f"2:0:{system}:{mod}:0:2:255:0:0:0:{t2mi_pid}"
-        )
-
-        # Generiši service ref sa odgovarajućim tipom
-        sid_hex = "03ea"
-        sflags = "0"
-        ref = f"{sid_hex}:{ns_hex}:{tsid_hex}:{onid_hex}:{stype}:{sflags}:0"
-
-        # p: linija
-        p_line = f"p:{provider},c:{data_pid}"
-        if caid:
-            p_line += f",C:{caid}"
-        p_line += f",f:{flags}"
+        # Isti zapisi kao i kod uvoza iz tabele (fake_t2mi.build_records)
+        row = {"freq": str(freq_mhz), "sr": str(sr_ksym), "pol": pol, "fec": fec, "system": system, "mod": mod,
+               "t2mi_pid": str(t2mi_pid), "plp": str(plp), "type": channel_type, "name": service_name,
+               "provider": provider, "data_pid": data_pid, "caid": caid, "flags": flags}
+        try:
+            tp_key, tp_params, ref, service_name, p_line = build_records(row, self.orbital_pos)
+        except ValueError as e:
+            self.session.open(MessageBox, "Invalid value: %s" % e, MessageBox.TYPE_ERROR)
+            return
 
         # Preview tekst sa naznačenim tipom
         type_names = {"data": "Data", "tv_sd": "TV SD", "tv_hd": "TV HD"}
@@ -2333,65 +2893,23 @@ class AddFakeT2MIScreen(Setup):
             return
 
         try:
-            lamedb_path = "/etc/enigma2/lamedb"
-
-            with open(lamedb_path, "r", encoding="utf-8", errors="ignore") as f:
-                lines = f.readlines()
-
-            transponder_insert_idx = None
-            services_insert_idx = None
-
-            i = 0
-            while i < len(lines):
-                line = lines[i].strip().lower()
-
-                if line == "transponders":
-                    i += 1
-                    while i < len(lines):
-                        if lines[i].strip().lower() == "end":
-                            transponder_insert_idx = i
-                            break
-                        i += 1
-
-                elif line == "services":
-                    i += 1
-                    while i < len(lines):
-                        if lines[i].strip().lower() == "end":
-                            services_insert_idx = i
-                            break
-                        i += 1
-                i += 1
-
-            if transponder_insert_idx is None or services_insert_idx is None:
-                raise Exception("Nije pronađena transponder ili services sekcija u lamedb!")
-
-            transponder_lines = [
-                self.tp_key.lower() + "\n",
-                "s " + self.tp_params + "\n",
-                "/\n"
-            ]
-
-            services_lines = [
-                self.ref.lower() + "\n",
-                self.service_name + "\n",
-                self.p_line + "\n"
-            ]
-
-            for line in reversed(services_lines):
-                lines.insert(services_insert_idx, line)
-
-            for line in reversed(transponder_lines):
-                lines.insert(transponder_insert_idx, line)
+            batch = getattr(self.parent, "batch", None)
+            transaction = batch if batch is not None else LamedbTransaction(active_lamedb_path())
+            # Postojeći TP se menja na mestu, novi ide na kraj transponders sekcije
+            transaction.put_transponder(self.tp_key, "s", self.tp_params)
+            transaction.insert_service(self.ref, self.service_name, self.p_line)
+
+            if transaction is batch:
+                self.session.open(MessageBox, "Queued (%d pending changes).\nCommit from Data Browser MENU." % len(batch),
+                                  MessageBox.TYPE_INFO, timeout=5)
+                self.close()
+                return
 
-            with open(lamedb_path, "w", encoding="utf-8") as f:
-                f.writelines(lines)
+            transaction.commit(label="Fake T2MI %s" % self.service_name)
 
-            from enigma import eDVBDB
-            db = eDVBDB.getInstance()
-            db.reloadServicelist()
-            db.reloadBouquets()
+            services_changed()
 
-            self.session.open(MessageBox, "Uspešno dodato u lamedb!\nReload izvršen.", MessageBox.TYPE_INFO, timeout=5)
+            self.session.open(MessageBox, "Uspešno dodato u lamedb!\nReload baze sledi.", MessageBox.TYPE_INFO, timeout=5)
 
             if self.parent and hasattr(self.parent, "reload"):
                 self.parent.reload()
@@ -2438,69 +2956,14 @@ class ConfirmationPreviewScreen(Screen):
 
     def saveToLamedb(self):
         try:
-            lamedb_path = "/etc/enigma2/lamedb"
+            transaction = LamedbTransaction(active_lamedb_path())
+            transaction.put_transponder(self.tp_key, "s", self.tp_params)
+            transaction.insert_service(self.ref, self.name, self.p_line)
+            transaction.commit(label="Fake T2MI %s" % self.name)
 
-            # Pročitaj ceo fajl
-            with open(lamedb_path, "r", encoding="utf-8", errors="ignore") as f:
-                lines = f.readlines()
+            services_changed()
 
-            # Pronađi pozicije za ubacivanje
-            transponder_insert_idx = None
-            services_insert_idx = None
-
-            i = 0
-            while i < len(lines):
-                line = lines[i].strip().lower()
-
-                if line == "transponders":
-                    i += 1
-                    while i < len(lines):
-                        if lines[i].strip().lower() == "end":
-                            transponder_insert_idx = i
-                            break
-                        i += 1
-
-                elif line == "services":
-                    i += 1
-                    while i < len(lines):
-                        if lines[i].strip().lower() == "end":
-                            services_insert_idx = i
-                            break
-                        i += 1
-                i += 1
-
-            if transponder_insert_idx is None or services_insert_idx is None:
-                raise Exception("Nije pronađena transponder ili services sekcija!")
-
-            # BEZ PRAZNIH REDOVA
-            transponder_lines = [
-                self.tp_key.lower() + "\n",
-                "s " + self.tp_params + "\n",
-                "/\n"
-            ]
-
-            services_lines = [
-                self.ref.lower() + "\n",
-                self.name + "\n",
-                self.p_line + "\n"
-            ]
-
-            # Ubaci od pozadine ka napred
-            for line in reversed(services_lines):
-                lines.insert(services_insert_idx, line)
-
-            for line in reversed(transponder_lines):
-                lines.insert(transponder_insert_idx, line)
-
-            with open(lamedb_path, "w", encoding="utf-8") as f:
-                f.writelines(lines)
-
-            from enigma import eDVBDB
-            db = eDVBDB.getInstance()
-            db.reloadServicelist()
-            db.reloadBouquets()
-
-            self.session.open(MessageBox, "Uspešno dodato u lamedb!\nReload izvršen.", MessageBox.TYPE_INFO, timeout=5)
+            self.session.open(MessageBox, "Uspešno dodato u lamedb!\nReload baze sledi.", MessageBox.TYPE_INFO, timeout=5)
         except Exception as e:
             self.session.open(MessageBox, f"Greška pri dodavanju:\n{str(e)}", MessageBox.TYPE_ERROR)
         self.close()
@@ -2585,6 +3048,9 @@ class SatelliteAnalyzer(Screen):
 
         self.onLayoutFinish.append(self.updateInfo)
 
+        # lamedb i satellites.xml se ucitavaju unapred (van UI niti)
+        preload_async(active_lamedb_path(), in_processes=config.plugins.CiefpSatelliteAnalyzer.preload_processes.value)
+
         self.astra_options = [
             ("4095 - c:150fff", "t2mi://#t2mi_pid=4095&t2mi_input=http://127.0.0.1:8001/-----:", "4095"),
             ("4095 - c:150fff plp0", "t2mi://#t2mi_pid=4095&t2mi_plp=0&t2mi_input=http://127.0.0.1:8001/-----:", "4095_plp0"),
@@ -2971,14 +3437,21 @@ class SatelliteAnalyzer(Screen):
     def openDataBrowser(self):
         # orbital_position već koristiš na više mesta (frontendInfo.getAll(True)) :contentReference[oaicite:3]{index=3}
         orbital_pos = 0
+        system = "s"
         service = self.session.nav.getCurrentService()
         if service:
             frontendInfo = service.frontendInfo()
             if frontendInfo:
                 data = frontendInfo.getAll(True)
                 orbital_pos = int(data.get("orbital_position", 0) or 0)
+                # DVB-T/T2 i DVB-C tuneri dobijaju svoj prikaz (bez orbitala)
+                tuner_type = data.get("tuner_type") or "DVB-S"
+                if tuner_type.startswith("DVB-T"):
+                    system = "t"
+                elif tuner_type.startswith("DVB-C"):
+                    system = "c"
 
-        self.session.open(DataBrowserScreen, self, orbital_pos)
+        self.session.open(DataBrowserScreen, self, orbital_pos, system)
 
     def updateSignalBars(self, snr_percent, agc):
         print(f"[SatelliteAnalyzer] Update signal bars: SNR={snr_percent}%, AGC={agc}%")
@@ -3262,18 +3735,10 @@ class SatelliteAnalyzer(Screen):
         return {0: "None", 1: "1", 2: "2", 3: "4", 4: "Auto"}.get(hi, "N/A")
 
     def getSatelliteNameFromXML(self, orbital_position):
-        satellites_file = "/etc/tuxbox/satellites.xml"
-        if not os.path.exists(satellites_file):
-            return self.formatOrbitalPos(orbital_position)
+        # satellites.xml se parsira jednom (preload ili prvi poziv), posle samo lookup
         try:
-            tree = ET.parse(satellites_file)
-            root = tree.getroot()
-            sat_pos = self.convertOrbitalPos(orbital_position)
-            for sat in root.findall("sat"):
-                pos = int(sat.get("position", "0"))
-                if pos == sat_pos:
-                    return sat.get("name", self.formatOrbitalPos(orbital_position))
-            return self.formatOrbitalPos(orbital_position)
+            name = satellite_names().get(self.convertOrbitalPos(orbital_position))
+            return name if name else self.formatOrbitalPos(orbital_position)
         except:
             return self.formatOrbitalPos(orbital_position)
 
@@ -3651,7 +4116,6 @@ class SatelliteAnalyzer(Screen):
 
     def processSelectedLog(self, log_file, block_ref):
         import re, os, urllib
-        from enigma import eDVBDB
 
         log_path = os.path.join("/tmp/CiefpSatelliteAnalyzer", log_file)
         if not os.path.exists(log_path):
@@ -3802,8 +4266,8 @@ class SatelliteAnalyzer(Screen):
                         f'#DESCRIPTION ({ch["type"]}) {ch["name"]} ({ch["pid"]})\n'
                     )
 
-        # Osveži bukete
-        eDVBDB.getInstance().reloadBouquets()
+        # Osveži bukete (samo buketi, servicelist se ne dira)
+        bouquets_changed()
         self.session.openWithCallback(
             lambda x: None,
             MessageBox,
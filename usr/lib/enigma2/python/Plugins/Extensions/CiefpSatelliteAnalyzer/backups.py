@@ -0,0 +1,218 @@
+"""
+Backup-i lamedb-a pre svakog upisa plugina, u zasebnom direktorijumu
+(podrazumevano .ciefp_backups pored lamedb-a). Sadrzaj se hesira, pa se isto
+stanje fajla ne cuva dva puta; backup se kompresuje (gzip ili xz) u pozadini,
+a posle svakog novog backup-a brisu se najstariji preko MAX_BACKUPS /
+MAX_BACKUP_BYTES. Najnoviji backup se nikad ne brise.
+"""
+
+import gzip
+import hashlib
+import os
+import shutil
+import threading
+import time
+
+try:
+    import lzma
+except ImportError:  # neki image-i nemaju _lzma
+    lzma = None
+
+# None -> .ciefp_backups u direktorijumu lamedb-a (isti fajl sistem, hard link radi)
+BACKUP_DIR = None
+COMPRESSION = "gzip"  # "gzip" ili "xz" (xz je manji, ali sporiji na slabim risiverima)
+MAX_BACKUPS = 10
+MAX_BACKUP_BYTES = 8 * 1024 * 1024
+
+EXTENSIONS = {"gzip": ".gz", "xz": ".xz"}
+PENDING = ".pending"
+
+# Kompresija i retencija idu redom, jedna po jedna
+_store_lock = threading.Lock()
+# pending -> ciljni backup, dok se kompresuje u pozadini; samo pod _queued_cond,
+# koji javlja wait_for_backups kad se posao (kompresija + retencija) zavrsi
+_queued = {}
+_queued_cond = threading.Condition()
+
+
+def backup_dir(path):
+    return BACKUP_DIR or os.path.join(os.path.dirname(path) or ".", ".ciefp_backups")
+
+
+def _compression():
+    return "xz" if COMPRESSION == "xz" and lzma is not None else "gzip"
+
+
+def _open_compressed(path, mode):
+    if path.endswith(".xz"):
+        if lzma is None:
+            raise Exception("xz backups need the lzma module")
+        return lzma.open(path, mode)
+    return gzip.open(path, mode, compresslevel=6) if "w" in mode else gzip.open(path, mode)
+
+
+def _parse_name(base, name):
+    """<base>.<YYYYmmdd_HHMMSS>.<hash><ext> -> (vreme, hash) ili None"""
+    if not name.startswith(base + "."):
+        return None
+    stem, ext = os.path.splitext(name[len(base) + 1:])
+    if ext not in (".gz", ".xz"):
+        return None
+    parts = stem.split(".")
+    if len(parts) != 2:
+        return None
+    return parts[0], parts[1]
+
+
+def _content_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def hold_backup(path):
+    """
+    Poziva se pod write lock-om, pre rename-a: trenutni fajl se zadrzava kao
+    hard link u direktorijumu backup-a (bez kopiranja). -> pending putanja ili None
+    """
+    if not os.path.exists(path):
+        return None
+    directory = backup_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    pending = os.path.join(directory, "%s.%s%s" % (os.path.basename(path), stamp, PENDING))
+    n = 1
+    while os.path.exists(pending):
+        pending = os.path.join(directory, "%s.%s_%d%s" % (os.path.basename(path), stamp, n, PENDING))
+        n += 1
+    try:
+        os.link(path, pending)
+    except OSError:
+        shutil.copyfile(path, pending)
+    return pending
+
+
+def store_backup(path, pending):
+    """
+    Zadrzani fajl ulazi u store: ako vec postoji backup istog sadrzaja, samo
+    se osvezi njegovo vreme; inace se kompresuje u pozadini. -> putanja backup-a
+    """
+    if pending is None:
+        return None
+    base = os.path.basename(path)
+    directory = os.path.dirname(pending)
+    stamp = os.path.basename(pending)[len(base) + 1:-len(PENDING)]
+    digest = _content_hash(pending)
+
+    # Provera duplikata i prijava u _queued zajedno, da dva upisa ne kompresuju isti sadrzaj
+    with _queued_cond:
+        names = os.listdir(directory) + [os.path.basename(t) for t in _queued.values()]
+        for name in names:
+            parsed = _parse_name(base, name)
+            if parsed and parsed[1] == digest:
+                existing = os.path.join(directory, name)
+                if os.path.exists(existing):
+                    os.utime(existing, None)
+                os.remove(pending)
+                print(f"[Backup] {base}: same content as {name}, not stored again")
+                return existing
+
+        target = os.path.join(directory, "%s.%s.%s%s" % (base, stamp, digest, EXTENSIONS[_compression()]))
+        _queued[pending] = target
+    threading.Thread(target=_compress, args=(path, pending, target), name="LamedbBackup", daemon=True).start()
+    return target
+
+
+def _compress(path, pending, target):
+    try:
+        with _store_lock:
+            if _write_compressed(pending, target):
+                try:
+                    _apply_retention(path)
+                except OSError as e:
+                    print(f"[Backup] Retention error: {e}")
+    finally:
+        with _queued_cond:
+            _queued.pop(pending, None)
+            _queued_cond.notify_all()
+
+
+def _write_compressed(pending, target):
+    tmp = target + ".tmp"
+    try:
+        with open(pending, "rb") as src, _open_compressed(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst, 65536)
+        with open(tmp, "rb+") as f:
+            os.fsync(f.fileno())
+        os.rename(tmp, target)
+        os.remove(pending)
+        print(f"[Backup] Stored {target} ({os.path.getsize(target)} bytes)")
+        return True
+    except Exception as e:
+        # pending ostaje; sledeci backup ga pokupi
+        print(f"[Backup] Error compressing {pending}: {e}")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return False
+
+
+def list_backups(path):
+    """Zavrseni backup-i, najnoviji prvi: [{'path', 'time', 'size', 'hash'}]"""
+    directory = backup_dir(path)
+    base = os.path.basename(path)
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    result = []
+    for name in names:
+        parsed = _parse_name(base, name)
+        if not parsed:
+            continue
+        full = os.path.join(directory, name)
+        try:
+            st = os.stat(full)
+        except OSError:
+            continue
+        result.append({'path': full, 'time': st.st_mtime, 'size': st.st_size, 'hash': parsed[1]})
+    result.sort(key=lambda b: b['time'], reverse=True)
+    return result
+
+
+def _apply_retention(path):
+    directory = backup_dir(path)
+    base = os.path.basename(path)
+    # Pending fajlovi iz prekinutih upisa (nestanak struje, restart enigma2); sveze
+    # ne diramo, jer upis koji ih je napravio tek treba da pozove store_backup
+    with _queued_cond:
+        queued = set(_queued)
+    for name in os.listdir(directory):
+        pending = os.path.join(directory, name)
+        if name.startswith(base + ".") and name.endswith(PENDING) and pending not in queued:
+            if time.time() - os.stat(pending).st_ctime > 60:
+                store_backup(path, pending)
+
+    total = 0
+    for i, backup in enumerate(list_backups(path)):
+        total += backup['size']
+        if i and (i >= MAX_BACKUPS or total > MAX_BACKUP_BYTES):
+            os.remove(backup['path'])
+            print(f"[Backup] Removed old backup {backup['path']}")
+
+
+def open_backup(backup):
+    """Raspakovani sadrzaj backup-a kao binarni stream"""
+    return _open_compressed(backup, "rb")
+
+
+def wait_for_backups(timeout=None):
+    """
+    Ceka da se zavrse kompresije u pozadini, zajedno sa retencijom (npr. pre
+    brisanja direktorijuma). -> False ako je timeout istekao pre toga
+    """
+    with _queued_cond:
+        return _queued_cond.wait_for(lambda: not _queued, timeout)
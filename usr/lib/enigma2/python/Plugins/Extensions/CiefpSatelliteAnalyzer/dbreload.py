@@ -0,0 +1,88 @@
+"""
+Zajednicki reload eDVBDB baze za sve ekrane plugina. Upis samo oznaci sta je
+promenjeno (servisi / buketi), a reload se radi jednom, kad posle poslednje
+oznake prodje QUIET_MS bez novih izmena. Ako su menjani samo buketi,
+reloadServicelist() se preskace.
+"""
+
+import time
+
+from enigma import eDVBDB, eTimer
+
+QUIET_MS = 1500
+
+
+class ReloadScheduler(object):
+
+    def __init__(self):
+        self.services_dirty = False
+        self.bouquets_dirty = False
+        self.requests = 0
+        self.last_report = ""
+        # f(report) posle svakog reload-a; ekrani se prijavljuju i odjavljuju (onClose)
+        self.listeners = []
+        self.timer = eTimer()
+        self.timer.callback.append(self.flush)
+
+    def mark(self, services=False, bouquets=False):
+        """Oznaka posle upisa; svaka nova oznaka pomera reload za QUIET_MS"""
+        self.services_dirty = self.services_dirty or services
+        self.bouquets_dirty = self.bouquets_dirty or bouquets
+        self.requests += 1
+        self.timer.start(QUIET_MS, True)
+
+    @property
+    def pending(self):
+        return self.services_dirty or self.bouquets_dirty
+
+    def flush(self):
+        """Reload odmah (i kad tajmer istekne); bez oznaka ne radi nista"""
+        self.timer.stop()
+        if not self.pending:
+            return
+        services, requests = self.services_dirty, self.requests
+        self.services_dirty = self.bouquets_dirty = False
+        self.requests = 0
+
+        db = eDVBDB.getInstance()
+        parts = []
+        start = time.time()
+        try:
+            if services:
+                db.reloadServicelist()
+                parts.append("servicelist %d ms" % ((time.time() - start) * 1000))
+            # Buketi se uvek ucitavaju posle servisa (referenciraju ih)
+            bouquets_start = time.time()
+            db.reloadBouquets()
+            parts.append("bouquets %d ms" % ((time.time() - bouquets_start) * 1000))
+            self.last_report = "Reload DB: %s (%d changes)" % (", ".join(parts), requests)
+        except Exception as e:
+            self.last_report = "Reload DB error: %s" % str(e)
+        print("[Reload] %s" % self.last_report)
+
+        for listener in self.listeners[:]:
+            try:
+                listener(self.last_report)
+            except Exception as e:
+                print("[Reload] Listener error:", e)
+
+
+_scheduler = None
+
+
+def reload_scheduler():
+    """Jedan scheduler za ceo plugin (pravi se u glavnoj niti, kao i eTimer)"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ReloadScheduler()
+    return _scheduler
+
+
+def services_changed():
+    """lamedb je menjan: servicelist + buketi"""
+    reload_scheduler().mark(services=True, bouquets=True)
+
+
+def bouquets_changed():
+    """Menjani su samo userbouquet fajlovi: samo reloadBouquets()"""
+    reload_scheduler().mark(bouquets=True)
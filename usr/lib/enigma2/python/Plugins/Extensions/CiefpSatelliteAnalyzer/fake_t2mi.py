@@ -0,0 +1,205 @@
+"""
+Fake T2MI transponderi i servisi: zapisi za jedan red (AddFakeT2MIScreen)
+i masovni uvoz iz CSV ili JSON tabele, npr.
+
+    freq,sr,pol,t2mi_pid,plp,name,provider,data_pid,caid,type
+    11778,15155,V,4096,0,RTR Planeta T2,Ciefp,151000,2600,data
+    12130,27500,H,4096,1,Mux 2 T2,Ciefp,151000,,tv_hd
+
+JSON je lista objekata sa istim kljucevima. Opcione kolone: fec, system, mod,
+flags, sid, tsid i pos (inace pozicija ekrana). Ceo uvoz se proverava nad
+indeksiranim lamedb-om i upisuje jednom transakcijom: ako ijedan red nije
+ispravan ili se sudara sa postojecim zapisom, ne upisuje se nista.
+"""
+
+import csv
+import json
+import os
+
+from Plugins.Extensions.CiefpSatelliteAnalyzer.lamedb import record_index, normalize_orbital
+from Plugins.Extensions.CiefpSatelliteAnalyzer.query import parse_orbital, POLARIZATIONS
+
+IMPORT_DIRS = ("/tmp", "/etc/enigma2", "/media/usb", "/media/hdd")
+
+TYPES = {"data": "0c", "tv_sd": "01", "tv_hd": "19"}
+DEFAULTS = {"fec": "3", "system": "1", "mod": "1", "flags": "4", "type": "data", "sid": "03ea", "tsid": "03ea",
+            "plp": "0", "t2mi_pid": "4096", "provider": "Ciefp", "data_pid": "151000", "caid": ""}
+REQUIRED = ("freq", "sr", "pol", "name")
+# Najveci PID (13 bita), isto i za polje na ekranu
+T2MI_PID_MAX = 8191
+ALIASES = {"frequency": "freq", "symbol_rate": "sr", "symbolrate": "sr", "polarization": "pol",
+           "t2mi": "t2mi_pid", "t2mi pid": "t2mi_pid", "pid": "t2mi_pid", "service": "name",
+           "service_name": "name", "prov": "provider", "data pid": "data_pid", "c": "data_pid",
+           "encryption": "caid", "channel_type": "type", "orbital": "pos"}
+
+
+class TableError(ValueError):
+    """Tabela nije ispravna ili se sudara sa lamedb-om; errors je lista poruka po redovima"""
+
+    def __init__(self, errors):
+        ValueError.__init__(self, "\n".join(errors))
+        self.errors = errors
+
+
+def import_files(dirs=IMPORT_DIRS):
+    """CSV/JSON fajlovi za uvoz iz uobicajenih direktorijuma"""
+    files = []
+    for directory in dirs:
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            continue
+        files.extend(os.path.join(directory, n) for n in names if n.lower().endswith((".csv", ".json")))
+    return files
+
+
+def read_table(path):
+    """CSV (zarez, tacka-zarez ili tab) ili JSON -> [(broj reda, {kolona: vrednost})]"""
+    with open(path, "r", encoding="utf-8-sig", errors="ignore") as f:
+        text = f.read()
+    if path.lower().endswith(".json"):
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise TableError(["Invalid JSON: %s" % e])
+        if isinstance(data, dict):
+            data = data.get("rows", [])
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            raise TableError(["JSON must be a list of objects"])
+        rows = list(enumerate(data, 1))
+    else:
+        lines = [line for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+        if not lines:
+            raise TableError(["Empty table"])
+        delimiter = max(",;\t", key=lines[0].count)
+        rows = list(enumerate(csv.DictReader(lines, delimiter=delimiter), 2))
+
+    result = []
+    for number, raw in rows:
+        row = {}
+        for key, value in raw.items():
+            if key is None:
+                continue
+            key = key.strip().lower()
+            row[ALIASES.get(key, key)] = "" if value is None else str(value).strip()
+        result.append((number, row))
+    return result
+
+
+def _number(row, field, low, high):
+    value = row.get(field) or DEFAULTS.get(field, "")
+    try:
+        number = int(float(value))
+    except ValueError:
+        raise ValueError("%s '%s' is not a number" % (field, value))
+    if not low <= number <= high:
+        raise ValueError("%s %d is out of range %d..%d" % (field, number, low, high))
+    return number
+
+
+def _hex(row, field, digits):
+    value = (row.get(field) or DEFAULTS[field]).lower()
+    value = value[2:] if value.startswith("0x") else value
+    try:
+        number = int(value, 16)
+    except ValueError:
+        raise ValueError("%s '%s' is not a hex number" % (field, value))
+    if number >= 16 ** digits:
+        raise ValueError("%s '%s' has more than %d hex digits" % (field, value, digits))
+    return format(number, "0%dx" % digits)
+
+
+def build_records(row, orbital_pos):
+    """
+    Jedan red -> (tp_key, tp_params, ref, ime, pline), isto kao AddFakeT2MIScreen.
+    Namespace je pozicija + frekvencija, pa dva reda na istoj frekvenciji
+    (npr. H i V) moraju da imaju razlicit tsid. ValueError za neispravan red.
+    """
+    for field in REQUIRED:
+        if not row.get(field):
+            raise ValueError("missing %s" % field)
+    freq = _number(row, "freq", 10000, 13000)
+    sr = _number(row, "sr", 1000, 60000)
+    pol = row["pol"].strip().lower()
+    pol = str(POLARIZATIONS[pol]) if pol in POLARIZATIONS else pol
+    if pol not in ("0", "1", "2", "3"):
+        raise ValueError("pol '%s' is not H, V, L or R" % row["pol"])
+    fec = _number(row, "fec", 0, 9)
+    system = _number(row, "system", 0, 1)
+    mod = _number(row, "mod", 1, 5)
+    t2mi_pid = _number(row, "t2mi_pid", 0, T2MI_PID_MAX)
+    plp = _number(row, "plp", 0, 255)
+    flags = _number(row, "flags", 0, 32)
+    stype = (row.get("type") or DEFAULTS["type"]).lower()
+    stype = TYPES.get(stype, stype[2:] if stype.startswith("0x") else stype)
+    try:
+        stype = format(int(stype, 16), "02x")
+    except ValueError:
+        raise ValueError("type '%s' is not data, tv_sd, tv_hd or a hex service type" % row.get("type"))
+    if row.get("pos"):
+        try:
+            orbital = parse_orbital(row["pos"])
+        except Exception:
+            raise ValueError("pos '%s' is not an orbital position" % row["pos"])
+    else:
+        orbital = normalize_orbital(orbital_pos)
+    sid = _hex(row, "sid", 4)
+    tsid = _hex(row, "tsid", 4)
+    caid = (row.get("caid") or "").split(" ")[0]
+    if caid:
+        caid = _hex({"caid": caid}, "caid", 4)
+
+    namespace = format(orbital, "04x") + format(freq, "04x")
+    tp_key = f"{namespace}:{tsid}:0000".upper()
+    tp_params = (f"{freq * 1000}:{sr * 1000}:{pol}:{fec}:{orbital}:"
+                 f"2:0:{system}:{mod}:0:2:255:0:0:{plp}:{t2mi_pid}")
+    ref = f"{sid}:{namespace}:{tsid}:0000:{stype}:0:0"
+    pline = f"p:{row.get('provider') or DEFAULTS['provider']},c:{row.get('data_pid') or DEFAULTS['data_pid']}"
+    if caid:
+        pline += f",C:{caid}"
+    pline += f",f:{flags}"
+    return tp_key, tp_params, ref, row["name"], pline
+
+
+def plan_import(path, rows, orbital_pos):
+    """
+    Provera svih redova pre upisa: ispravnost, sudari unutar tabele i sa
+    postojecim transponderima/servisima (preko indeksa). -> [zapisi]; TableError sa svim greskama
+    """
+    index = record_index(path)
+    errors = []
+    records = []
+    tp_rows = {}
+    ref_rows = {}
+    for number, row in rows:
+        try:
+            tp_key, tp_params, ref, name, pline = build_records(row, orbital_pos)
+        except ValueError as e:
+            errors.append("row %d: %s" % (number, e))
+            continue
+        if tp_key in tp_rows:
+            errors.append("row %d: transponder %s already used by row %d (set a different tsid)"
+                          % (number, tp_key, tp_rows[tp_key]))
+        elif index.find_transponder(tp_key) is not None:
+            errors.append("row %d: transponder %s already exists in lamedb" % (number, tp_key))
+        tp_rows.setdefault(tp_key, number)
+        if ref in ref_rows:
+            errors.append("row %d: service %s already used by row %d" % (number, ref, ref_rows[ref]))
+        elif index.find_service(ref) is not None:
+            errors.append("row %d: service %s already exists in lamedb" % (number, ref))
+        ref_rows.setdefault(ref, number)
+        records.append((tp_key, tp_params, ref, name, pline))
+    if errors:
+        raise TableError(errors)
+    if not records:
+        raise TableError(["No rows to import"])
+    return records
+
+
+def queue_import(transaction, records):
+    """Svi zapisi u transakciju (batch Data Browser-a ili nova); upis radi commit"""
+    for tp_key, tp_params, ref, name, pline in records:
+        transaction.put_transponder(tp_key, "s", tp_params)
+        transaction.insert_service(ref, name, pline)
+    return transaction
+
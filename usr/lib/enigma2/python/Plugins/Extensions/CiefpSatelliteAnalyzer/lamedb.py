@@ -0,0 +1,2195 @@
+import bisect
+import fcntl
+import hashlib
+import marshal
+import mmap
+import os
+import shutil
+import threading
+import time
+
+from array import array
+
+from Plugins.Extensions.CiefpSatelliteAnalyzer import backups
+
+LAMEDB_PATH = "/etc/enigma2/lamedb"
+LAMEDB5_PATH = "/etc/enigma2/lamedb5"
+
+# Menja se kad god se promeni sadrzaj snapshot-a
+SNAPSHOT_VERSION = 5
+
+# Otisak sadrzaja (uz stat potpis): velicina + DIGEST_SAMPLES blokova od
+# DIGEST_BLOCK bajtova (pocetak, kraj i ravnomerno izmedju), ne ceo fajl
+DIGEST_BLOCK = 4096
+DIGEST_SAMPLES = 16
+
+# Posle izmena plugina snapshot se ne prepisuje odmah: upisuje se jednom,
+# kad prodje SNAPSHOT_DELAY sekundi bez novih izmena ili kad se ekran zatvori
+SNAPSHOT_DELAY = 30.0
+
+# path -> (stat potpis, LamedbModel); deli se izmedju svih ekrana
+_cache = {}
+_cache_lock = threading.RLock()
+
+
+def normalize_orbital(orb):
+    """Orbital pozicija u opsegu 0..3599 (kao frontend orbital_position)"""
+    return orb + 3600 if orb < 0 else orb
+
+
+def namespace_orbital(ns):
+    """Orbital iz DVB namespace-a (gornjih 16 bita)"""
+    return (ns >> 16) & 0xFFFF
+
+
+# Namespace-i koje enigma2 dodeljuje zemaljskim i kablovskim transponderima
+NAMESPACE_SYSTEMS = {0xEEEE: "t", 0xFFFF: "c"}
+
+
+def namespace_system(ns):
+    """Delivery sistem ('s', 't' ili 'c') iz DVB namespace-a"""
+    return NAMESPACE_SYSTEMS.get((ns >> 16) & 0xFFFF, "s")
+
+
+def _to_int(value, default=0):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def tp_key_str(key):
+    """(namespace, tsid, onid) -> '00C00000:0001:0001'"""
+    return "%08X:%04X:%04X" % key
+
+
+def pline_keys(pline):
+    """
+    Provider i CAID-ovi iz provider linije ('p:ARD,c:000100,C:0b00,f:4'),
+    po istim tokenima kao LamedbEditorScreen._parse_pline_to_custom.
+    Radi i nad bytes linijom (mmap skener) - dekodira se samo ime providera.
+    -> (provider ili "", [caid, ...])
+    """
+    if pline.__class__ is bytes:
+        sep, p_tok, c_tok = b",", b"p:", b"C:"
+    else:
+        sep, p_tok, c_tok = ",", "p:", "C:"
+    provider = None
+    caids = []
+    for token in pline.split(sep):
+        token = token.strip()
+        if token.startswith(p_tok):
+            if provider is None:
+                provider = token[2:]
+        elif token.startswith(c_tok):
+            try:
+                caid = int(token[2:], 16)
+            except ValueError:
+                continue
+            if caid not in caids:
+                caids.append(caid)
+    if provider is None:
+        provider = ""
+    elif provider.__class__ is bytes:
+        provider = provider.decode("utf-8", "ignore")
+    return provider.strip(), caids
+
+
+class Transponder(object):
+    """
+    Transponder iz lamedb-a; __slots__ umesto dict-a po zapisu.
+    prefix je delivery sistem ('s', 't', 'c'), frequency je uvek u MHz,
+    a bandwidth se koristi samo za DVB-T.
+    """
+
+    __slots__ = ("namespace", "tsid", "onid", "prefix", "full_params", "frequency", "symbol_rate",
+                 "polarization", "fec", "orbital", "system", "modulation", "bandwidth")
+
+    def __init__(self, namespace, tsid, onid, prefix, full_params, frequency=0, symbol_rate=0,
+                 polarization=0, fec=0, orbital=0, system=0, modulation=0, bandwidth=0):
+        self.namespace = namespace
+        self.tsid = tsid
+        self.onid = onid
+        self.prefix = prefix
+        self.full_params = full_params
+        self.frequency = frequency
+        self.symbol_rate = symbol_rate
+        self.polarization = polarization
+        self.fec = fec
+        self.orbital = orbital
+        self.system = system
+        self.modulation = modulation
+        self.bandwidth = bandwidth
+
+    @property
+    def key(self):
+        return (self.namespace, self.tsid, self.onid)
+
+    @property
+    def tp_key(self):
+        return tp_key_str(self.key)
+
+    def to_tuple(self):
+        return tuple(getattr(self, attr) for attr in self.__slots__)
+
+    @classmethod
+    def from_tuple(cls, values):
+        return cls(*values)
+
+
+class Service(object):
+    """
+    Servis iz lamedb-a. Ime, provider linija i PID-ovi mogu da stignu kao
+    bytes (mmap skener) i dekodiraju se tek kad se prvi put procitaju.
+    """
+
+    __slots__ = ("_ref", "_name", "_pline", "_pids", "sid", "namespace", "tsid", "onid",
+                 "stype", "flags", "orbital")
+
+    def __init__(self, ref, name, pline, pids, sid, namespace, tsid, onid, stype, flags, orbital):
+        self._ref = ref
+        self._name = name
+        self._pline = pline
+        self._pids = pids
+        self.sid = sid
+        self.namespace = namespace
+        self.tsid = tsid
+        self.onid = onid
+        self.stype = stype
+        self.flags = flags
+        self.orbital = orbital
+
+    @property
+    def ref(self):
+        value = self._ref
+        if value.__class__ is bytes:
+            value = self._ref = self._decode_ref(value)
+        return value
+
+    def _decode_ref(self, value):
+        if not value:
+            # Iz snapshot-a: ref je u kanonskom obliku, pa se pravi iz brojeva
+            return self.canonical_ref()
+        # bytes je sirov header "sid:ns:tsid:onid:stype:flags[:...]"
+        fields = value.decode("ascii", "ignore").split(":")
+        return f"{self.sid:04x}:{':'.join(fields[1:6])}:0"
+
+    def canonical_ref(self):
+        return f"{self.sid:04x}:{self.namespace:08x}:{self.tsid:04x}:{self.onid:04x}:{self.stype:x}:{self.flags:x}:0"
+
+    @property
+    def name(self):
+        value = self._name
+        if value.__class__ is bytes:
+            value = self._name = value.decode("utf-8", "ignore")
+        return value
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+
+    @property
+    def pline(self):
+        value = self._pline
+        if value.__class__ is bytes:
+            value = self._pline = value.decode("utf-8", "ignore") if value != b"?" else ""
+        return value
+
+    @pline.setter
+    def pline(self, value):
+        self._pline = value
+
+    @property
+    def pids(self):
+        value = self._pids
+        if value.__class__ is bytes:
+            value = self._pids = value.decode("utf-8", "ignore")
+        return value
+
+    @property
+    def tp(self):
+        return (self.namespace, self.tsid, self.onid)
+
+    @property
+    def tp_key(self):
+        return tp_key_str(self.tp)
+
+    def to_tuple(self):
+        return tuple(getattr(self, attr) for attr in self.__slots__)
+
+    @classmethod
+    def from_tuple(cls, values):
+        return cls(*values)
+
+
+# Tipovi servisa za statistiku. Plugin ih pise heksadecimalno ("19", "0c"), a
+# enigma2 decimalno ("25", "12"); polje se parsira kao hex, pa su tu oba zapisa.
+TV_TYPES = frozenset((0x01, 0x11, 0x16, 0x19, 0x1F, 0x20, 0x86, 0xC3,  # hex zapis
+                      0x17, 0x22, 0x25, 0x31, 0x32, 0x134, 0x195))  # decimalni zapis procitan kao hex
+RADIO_TYPES = frozenset((0x02, 0x0A, 0x10))
+
+
+def service_category(stype):
+    """'tv', 'radio' ili 'data' za dati tip servisa"""
+    if stype in TV_TYPES:
+        return "tv"
+    if stype in RADIO_TYPES:
+        return "radio"
+    return "data"
+
+
+def _discard(index, bucket, key):
+    keys = index.get(bucket)
+    if keys is not None:
+        keys.discard(key)
+        if not keys and bucket not in ("s", "t", "c"):
+            del index[bucket]
+
+
+def _remove_from(index, bucket, service):
+    items = index.get(bucket)
+    if items is not None:
+        try:
+            items.remove(service)
+        except ValueError:
+            return
+        if not items:
+            del index[bucket]
+
+
+def _count(counter, bucket, delta):
+    value = counter.get(bucket, 0) + delta
+    if value > 0:
+        counter[bucket] = value
+    else:
+        counter.pop(bucket, None)
+
+
+class LamedbModel(object):
+    """Rezultat jednog prolaza kroz lamedb: transponderi i servisi"""
+
+    def __init__(self, path):
+        self.path = path
+        self.version = 4
+        self.signature = None
+        self.digest = None
+        self.transponders = {}  # (namespace, tsid, onid) -> Transponder
+        self.services = []
+        # Indeksi, grade se pri dodavanju zapisa (jednom po verziji lamedb-a)
+        self.by_orbital = {}  # orbital -> set kljuceva, samo satelitski ('s')
+        self.by_system = {"s": set(), "t": set(), "c": set()}  # delivery sistem -> set kljuceva
+        self.services_by_tp = {}  # (namespace, tsid, onid) -> [service, ...]
+        self.by_provider = {}  # provider (p:) -> [service, ...]
+        self.by_caid = {}  # CAID (C:) -> [service, ...]
+        # Zbirovi za statistiku; odrzavaju se pri svakom dodavanju/brisanju zapisa
+        self.tp_counts = {}  # delivery sistem -> broj transpondera
+        self.orbital_counts = {}  # orbital -> broj servisa (satelit)
+        self.system_counts = {}  # delivery sistem -> broj servisa
+        self.category_counts = {}  # 'tv' / 'radio' / 'data' -> broj servisa
+        self.fta_count = 0  # servisi bez ijednog C: tokena
+
+    def system_for(self, key):
+        tp = self.transponders.get(key)
+        return tp.prefix if tp else namespace_system(key[0])
+
+    def add_transponder(self, tp):
+        key = tp.key
+        if key in self.transponders:
+            # Dupli kljuc u lamedb-u: vazi poslednji, kao i u enigma2
+            self.remove_transponder(key)
+        self.transponders[key] = tp
+        _count(self.tp_counts, tp.prefix, 1)
+        self.by_system.setdefault(tp.prefix, set()).add(key)
+        if tp.prefix == "s":
+            self.by_orbital.setdefault(tp.orbital, set()).add(key)
+
+    def add_service(self, service):
+        self.services.append(service)
+        key = service.tp
+        self.services_by_tp.setdefault(key, []).append(service)
+        # Servisi bez transpondera se vode pod sistemom/orbitalom iz namespace-a
+        system = self.system_for(key)
+        self.by_system.setdefault(system, set()).add(key)
+        if system == "s":
+            self.by_orbital.setdefault(service.orbital, set()).add(key)
+
+        provider, caids = pline_keys(service._pline)
+        if provider:
+            self.by_provider.setdefault(provider, []).append(service)
+        for caid in caids:
+            self.by_caid.setdefault(caid, []).append(service)
+        self._count_service(service, system, caids, 1)
+
+    def _count_service(self, service, system, caids, delta):
+        _count(self.system_counts, system, delta)
+        if system == "s":
+            _count(self.orbital_counts, service.orbital, delta)
+        _count(self.category_counts, service_category(service.stype), delta)
+        if not caids:
+            self.fta_count += delta
+
+    def remove_service(self, service):
+        """Obrnuto od add_service; indeksi i zbirovi se azuriraju bez ponovnog parse-a"""
+        self.services.remove(service)
+        key = service.tp
+        system = self.system_for(key)
+        _remove_from(self.services_by_tp, key, service)
+        self._drop_tp_key(service, system)
+
+        provider, caids = pline_keys(service._pline)
+        if provider:
+            _remove_from(self.by_provider, provider, service)
+        for caid in caids:
+            _remove_from(self.by_caid, caid, service)
+        self._count_service(service, system, caids, -1)
+
+    def remove_services(self, services):
+        """
+        Vise servisa odjednom (kompaktovanje): services i svaka pogodjena kanta
+        indeksa se filtriraju jednom, umesto list.remove po servisu (O(k*n)).
+        """
+        services = list({id(s): s for s in services}.values())
+        gone = set(map(id, services))
+        if not gone:
+            return
+        self.services = [s for s in self.services if id(s) not in gone]
+
+        tp_keys, providers, caid_keys = set(), set(), set()
+        systems = []
+        for service in services:
+            system = self.system_for(service.tp)
+            provider, caids = pline_keys(service._pline)
+            tp_keys.add(service.tp)
+            if provider:
+                providers.add(provider)
+            caid_keys.update(caids)
+            self._count_service(service, system, caids, -1)
+            systems.append(system)
+
+        for index, buckets in ((self.services_by_tp, tp_keys), (self.by_provider, providers),
+                               (self.by_caid, caid_keys)):
+            for bucket in buckets:
+                items = index.get(bucket)
+                if items is None:
+                    continue
+                items = [s for s in items if id(s) not in gone]
+                if items:
+                    index[bucket] = items
+                else:
+                    del index[bucket]
+        for service, system in zip(services, systems):
+            self._drop_tp_key(service, system)
+
+    def _drop_tp_key(self, service, system):
+        # Kljuc TP-a ostaje u by_system/by_orbital dok ima transponder ili servis
+        key = service.tp
+        if key not in self.services_by_tp:
+            tp = self.transponders.get(key)
+            if tp is None:
+                _discard(self.by_system, system, key)
+            if system == "s" and (tp is None or tp.orbital != service.orbital):
+                _discard(self.by_orbital, service.orbital, key)
+
+    def remove_transponder(self, key):
+        tp = self.transponders.pop(key, None)
+        if tp is None:
+            return None
+        _count(self.tp_counts, tp.prefix, -1)
+        if key not in self.services_by_tp:
+            _discard(self.by_system, tp.prefix, key)
+            if tp.prefix == "s":
+                _discard(self.by_orbital, tp.orbital, key)
+        return tp
+
+    def find_service(self, ref):
+        """Servis po ref-u iz Data Browser-a (sid:ns:tsid:onid:stype:flags:0)"""
+        parsed = _parse_service_header(ref.strip())
+        if not parsed:
+            return None
+        for service in self.services_by_tp.get((parsed[2], parsed[3], parsed[4]), ()):
+            # ref moze biti i header iz fajla (6 polja, bez zavrsnog :0)
+            if header_matches_ref(service.ref, ref) or header_matches_ref(ref, service.ref):
+                return service
+        return None
+
+    def service_from_lines(self, header, name, pline):
+        """Servis iz linija koje plugin upisuje (header, ime, provider linija)"""
+        parsed = _parse_service_header(header.strip())
+        if not parsed:
+            return None
+        orbitals = {}
+        key = (parsed[2], parsed[3], parsed[4])
+        if key in self.transponders:
+            orbitals[key] = self.transponders[key].orbital
+        return _make_service(parsed, name, pline, (), orbitals)
+
+    def put_transponder(self, tp_key, prefix, params):
+        """Dodaje ili menja transponder; servisi na njemu prate promenu orbitala"""
+        tp = _parse_transponder(tp_key, prefix, params)
+        if tp is None:
+            return None
+        services = list(self.services_by_tp.get(tp.key, ()))
+        for service in services:
+            self.remove_service(service)
+        self.remove_transponder(tp.key)
+        self.add_transponder(tp)
+        for service in services:
+            service.orbital = tp.orbital
+            self.add_service(service)
+        return tp
+
+    def replace_service(self, ref, header, name, pline):
+        """Zamena jednog servisa (izmena iz editora); bez ref-a u modelu servis se dodaje"""
+        old = self.find_service(ref)
+        if old is not None:
+            self.remove_service(old)
+        service = self.service_from_lines(header, name, pline)
+        if service is not None:
+            self.add_service(service)
+        return service
+
+    def transponder_for(self, service):
+        return self.transponders.get(service.tp)
+
+    def transponders_for_orbital(self, orbital):
+        keys = self.by_orbital.get(orbital, ())
+        return [self.transponders[k] for k in sorted(keys) if k in self.transponders]
+
+    def services_for_orbital(self, orbital):
+        result = []
+        for key in self.by_orbital.get(orbital, ()):
+            result.extend(self.services_by_tp.get(key, ()))
+        return result
+
+    def services_for_provider(self, provider):
+        return self.by_provider.get(provider, [])
+
+    def services_for_caid(self, caid):
+        return self.by_caid.get(caid, [])
+
+    def transponders_for_system(self, system):
+        keys = self.by_system.get(system, ())
+        return [self.transponders[k] for k in sorted(keys) if k in self.transponders]
+
+    def services_for_system(self, system):
+        result = []
+        for key in self.by_system.get(system, ()):
+            result.extend(self.services_by_tp.get(key, ()))
+        return result
+
+
+def _parse_transponder(key_str, prefix, params_str):
+    try:
+        ns_h, tsid_h, onid_h = key_str.split(":")
+        ns, tsid, onid = int(ns_h, 16), int(tsid_h, 16), int(onid_h, 16)
+    except ValueError:
+        return None
+
+    p = params_str.split(":")
+
+    def field(i):
+        return _to_int(p[i]) if len(p) > i else 0
+
+    if prefix == "t":
+        # t freq(Hz):bandwidth:code_rate_hp:code_rate_lp:modulation:transmission_mode:guard_interval:
+        #   hierarchy:inversion:flags:system:plp_id
+        return Transponder(
+            ns, tsid, onid, prefix, params_str,
+            frequency=field(0) // 1000000,
+            fec=field(2),
+            orbital=namespace_orbital(ns),
+            system=field(10),
+            modulation=field(4),
+            bandwidth=field(1),
+        )
+
+    if prefix == "c":
+        # c freq(kHz):symbol_rate:inversion:modulation:fec_inner:flags:system
+        return Transponder(
+            ns, tsid, onid, prefix, params_str,
+            frequency=field(0) // 1000,
+            symbol_rate=field(1) // 1000,
+            fec=field(4),
+            orbital=namespace_orbital(ns),
+            system=field(6),
+            modulation=field(3),
+        )
+
+    # s freq:sr:pol:fec:orbital:inversion:flags:system:modulation:rolloff:pilot...
+    orbital = normalize_orbital(_to_int(p[4], -1)) if len(p) > 4 and p[4].lstrip("-").isdigit() \
+        else namespace_orbital(ns)
+
+    return Transponder(
+        ns, tsid, onid, prefix, params_str,
+        frequency=field(0) // 1000,
+        symbol_rate=field(1) // 1000,
+        polarization=field(2),
+        fec=field(3),
+        orbital=orbital,
+        system=field(7),
+        modulation=field(8),
+    )
+
+
+def _parse_service_header(line):
+    """sid:ns:tsid:onid:stype:flags[:...] -> (polja, sid, ns, tsid, onid, stype, flags) ili None"""
+    fields = line.split(":")
+    if len(fields) < 6:
+        return None
+    try:
+        return (fields, int(fields[0], 16), int(fields[1], 16), int(fields[2], 16),
+                int(fields[3], 16), int(fields[4], 16), int(fields[5], 16) if fields[5] else 0)
+    except ValueError:
+        return None
+
+
+def _make_service(parsed, name, pline, cached, orbitals):
+    fields, sid, ns, tsid, onid, stype, flags = parsed
+    key = (ns, tsid, onid)
+    return Service(
+        f"{sid:04x}:{fields[1]}:{fields[2]}:{fields[3]}:{fields[4]}:{fields[5]}:0",
+        name,
+        pline if pline != "?" else "",
+        " ".join(cached) if cached else "",
+        sid, ns, tsid, onid, stype, flags,
+        orbitals[key] if key in orbitals else namespace_orbital(ns),
+    )
+
+
+def _iter_v4(lines, orbitals):
+    section = None
+    tp_key_line = None
+    pending = None  # [parsed header, ime, pline, [cached]]
+
+    for line in lines:
+        line = line.strip()
+
+        if section is None:
+            if line == "transponders" or line == "services":
+                section = line
+            continue
+
+        if section == "transponders":
+            # key linija, parametri, "/"
+            if line == "end":
+                section = None
+                tp_key_line = None
+            elif tp_key_line is None:
+                if line.count(":") == 2:
+                    tp_key_line = line
+            else:
+                tp = _parse_transponder(tp_key_line, line[:1], line[2:].strip())
+                tp_key_line = None
+                if tp:
+                    orbitals[tp.key] = tp.orbital
+                    yield "t", tp
+            continue
+
+        # services: header, ime, provider/PID linija (+ eventualne dodatne p:/c:/C:/f: linije)
+        if pending is not None:
+            if len(pending) < 3:
+                pending.append(line)
+                continue
+            if len(pending) == 3:
+                pending.append([])
+            if line.startswith(("p:", "c:", "C:", "f:")):
+                pending[3].append(line)
+                continue
+            yield "s", _make_service(pending[0], pending[1], pending[2], pending[3], orbitals)
+            pending = None
+
+        if line == "end":
+            section = None
+            continue
+
+        parsed = _parse_service_header(line)
+        if parsed:
+            pending = [parsed]
+
+    if pending is not None:
+        while len(pending) < 3:
+            pending.append("?" if len(pending) == 1 else "")
+        if len(pending) == 3:
+            pending.append([])
+        yield "s", _make_service(pending[0], pending[1], pending[2], pending[3], orbitals)
+
+
+def params_from_v5(feparams):
+    """'s:11778000:...:2,MIS/PLS:255:0:0,T2MI:0:4096' -> ('s', v4 parametri)"""
+    groups = feparams.split(",")
+    prefix = groups[0][:1]
+    params = groups[0][2:]
+    mis = t2mi = None
+    for g in groups[1:]:
+        if g.startswith("MIS/PLS:"):
+            mis = g[8:]
+        elif g.startswith("T2MI:"):
+            t2mi = g[5:]
+    if mis or t2mi:
+        params += ":" + (mis or "255:0:0")
+    if t2mi:
+        params += ":" + t2mi
+    return prefix, params
+
+
+def params_to_v5(prefix, params):
+    """Obrnuto od params_from_v5: v4 parametri -> lamedb5 FEPARMS"""
+    p = params.split(":")
+    if prefix != "s" or len(p) <= 11:
+        return f"{prefix}:{params}"
+    out = f"{prefix}:{':'.join(p[:11])},MIS/PLS:{':'.join(p[11:14])}"
+    if len(p) > 14:
+        out += f",T2MI:{':'.join(p[14:16])}"
+    return out
+
+
+def split_v5_service(line):
+    """'s:HEADER,"ime",p:...' -> (header, ime, pline) ili None"""
+    q = line.find(',"')
+    if not line.startswith("s:") or q < 0:
+        return None
+    end = line.find('"', q + 2)
+    if end < 0:
+        return None
+    rest = line[end + 1:]
+    return line[2:q], line[q + 2:end], rest[1:] if rest.startswith(",") else rest
+
+
+def _iter_v5(lines, orbitals):
+    # lamedb5: svaki zapis je jedna linija, nema gledanja unapred
+    for line in lines:
+        if line.startswith("t:"):
+            comma = line.find(",")
+            if comma < 0:
+                continue
+            prefix, params = params_from_v5(line[comma + 1:].strip())
+            tp = _parse_transponder(line[2:comma], prefix, params)
+            if tp:
+                orbitals[tp.key] = tp.orbital
+                yield "t", tp
+        elif line.startswith("s:"):
+            parts = split_v5_service(line.rstrip())
+            if not parts:
+                continue
+            parsed = _parse_service_header(parts[0])
+            if parsed:
+                yield "s", _make_service(parsed, parts[1], parts[2], (), orbitals)
+
+
+def detect_version(first_line):
+    return 5 if "/5/" in first_line else 4
+
+
+def iter_lamedb(path=LAMEDB_PATH, stats=None):
+    """
+    Generator zapisa iz lamedb-a (v4 ili v5): ("t", transponder) i ("s", servis),
+    redom kako se citaju. Fajl se cita liniju po liniju, pa memorija ne raste
+    sa velicinom fajla; pozivalac moze da filtrira po orbitalu ili da stane ranije.
+
+    stats (dict, opciono) se puni usput: 'lines', 'version', a na kraju i 'digest'.
+    """
+    if stats is None:
+        stats = {}
+    stats['lines'] = 0
+
+    def read_lines():
+        with open(path, "rb") as f:
+            for raw in f:
+                stats['lines'] += 1
+                yield raw.decode("utf-8", "ignore")
+
+    lines = read_lines()
+    version = detect_version(next(lines, ""))
+    stats['version'] = version
+
+    # Orbital po transponderu - jedino sto generator pamti (servisi dolaze posle transpondera)
+    orbitals = {}
+    records = _iter_v5(lines, orbitals) if version == 5 else _iter_v4(lines, orbitals)
+    for record in records:
+        yield record
+    stats['digest'] = quick_digest(path)
+
+
+# ---------------- mmap skener (bytes, bez dekodiranja celog fajla) ----------------
+
+def _scan_service_header(line):
+    """Kao _parse_service_header, ali nad bytes linijom; vraca i sirovi header za ref"""
+    fields = line.split(b":")
+    if len(fields) < 6:
+        return None
+    try:
+        return (line, int(fields[0], 16), int(fields[1], 16), int(fields[2], 16),
+                int(fields[3], 16), int(fields[4], 16), int(fields[5], 16) if fields[5] else 0)
+    except ValueError:
+        return None
+
+
+def _scan_make_service(parsed, name, pline, cached, orbitals):
+    header, sid, ns, tsid, onid, stype, flags = parsed
+    key = (ns, tsid, onid)
+    return Service(
+        header, name, pline, b" ".join(cached) if cached else "",
+        sid, ns, tsid, onid, stype, flags,
+        orbitals[key] if key in orbitals else namespace_orbital(ns),
+    )
+
+
+def _scan_v4(lines, orbitals, stats):
+    # Ista masina stanja kao _iter_v4; hex polja se citaju direktno iz bytes-a
+    section = None
+    tp_key_line = None
+    pending = None
+    count = stats['lines']
+
+    for line in lines:
+        count += 1
+        line = line.strip()
+
+        if section is None:
+            if line == b"transponders" or line == b"services":
+                section = line
+            continue
+
+        if section == b"transponders":
+            if line == b"end":
+                section = None
+                tp_key_line = None
+            elif tp_key_line is None:
+                if line.count(b":") == 2:
+                    tp_key_line = line
+            else:
+                tp = _parse_transponder(tp_key_line.decode("ascii", "ignore"), line[:1].decode("ascii", "ignore"),
+                                        line[2:].strip().decode("utf-8", "ignore"))
+                tp_key_line = None
+                if tp:
+                    orbitals[tp.key] = tp.orbital
+                    stats['lines'] = count
+                    yield "t", tp
+            continue
+
+        if pending is not None:
+            if len(pending) < 3:
+                pending.append(line)
+                continue
+            if len(pending) == 3:
+                pending.append([])
+            if line[:2] in (b"p:", b"c:", b"C:", b"f:"):
+                pending[3].append(line)
+                continue
+            stats['lines'] = count
+            yield "s", _scan_make_service(pending[0], pending[1], pending[2], pending[3], orbitals)
+            pending = None
+
+        if line == b"end":
+            section = None
+            continue
+
+        parsed = _scan_service_header(line)
+        if parsed:
+            pending = [parsed]
+
+    if pending is not None:
+        while len(pending) < 3:
+            pending.append(b"?" if len(pending) == 1 else b"")
+        if len(pending) == 3:
+            pending.append([])
+        stats['lines'] = count
+        yield "s", _scan_make_service(pending[0], pending[1], pending[2], pending[3], orbitals)
+    stats['lines'] = count
+
+
+def _scan_v5(lines, orbitals, stats):
+    count = stats['lines']
+    for line in lines:
+        count += 1
+        if line.startswith(b"t:"):
+            line = line.decode("utf-8", "ignore")
+            comma = line.find(",")
+            if comma < 0:
+                continue
+            prefix, params = params_from_v5(line[comma + 1:].strip())
+            tp = _parse_transponder(line[2:comma], prefix, params)
+            if tp:
+                orbitals[tp.key] = tp.orbital
+                stats['lines'] = count
+                yield "t", tp
+        elif line.startswith(b"s:"):
+            line = line.rstrip()
+            q = line.find(b',"')
+            if q < 0:
+                continue
+            end = line.find(b'"', q + 2)
+            if end < 0:
+                continue
+            parsed = _scan_service_header(line[2:q])
+            if parsed:
+                rest = line[end + 1:]
+                stats['lines'] = count
+                yield "s", _scan_make_service(parsed, line[q + 2:end], rest[1:] if rest.startswith(b",") else rest,
+                                              (), orbitals)
+    stats['lines'] = count
+
+
+def scan_lamedb(path=LAMEDB_PATH, stats=None):
+    """
+    Isto sto i iter_lamedb, ali preko mmap-a i nad bytes linijama: hex polja
+    se parsiraju bez dekodiranja, a ime, provider i PID-ovi servisa ostaju
+    bytes dok ih ekran ne procita (Service.name / .pline / .pids).
+    """
+    if stats is None:
+        stats = {}
+    stats['lines'] = 0
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            stats['version'] = 4
+            stats['digest'] = _sampled_digest(0, None)
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        # Bez omotaca oko readline-a; broj linija vodi sama masina stanja
+        version = detect_version(mm.readline().decode("ascii", "ignore"))
+        stats['version'] = version
+        stats['lines'] = 1
+
+        orbitals = {}
+        lines = iter(mm.readline, b"")
+        records = _scan_v5(lines, orbitals, stats) if version == 5 else _scan_v4(lines, orbitals, stats)
+        for record in records:
+            yield record
+        stats['digest'] = _sampled_digest(len(mm), lambda offset, count: mm[offset:offset + count])
+    finally:
+        mm.close()
+
+
+class LoadCancelled(Exception):
+    """Ucitavanje prekinuto preko stats['cancel']"""
+
+
+def parse_lamedb(path=LAMEDB_PATH, stats=None):
+    """
+    Jedan prolaz kroz lamedb (v4 ili v5): transponderi i servisi se grade
+    iz istog citanja fajla. Preko stats (dict, opciono) druga nit prati
+    napredak ('lines') i moze da prekine parse sa stats['cancel'] = True.
+    """
+    model = LamedbModel(path)
+    if stats is None:
+        stats = {}
+    for kind, record in scan_lamedb(path, stats):
+        if stats.get('cancel'):
+            raise LoadCancelled(path)
+        if kind == "t":
+            model.add_transponder(record)
+        else:
+            model.add_service(record)
+    model.version = stats['version']
+    model.digest = stats['digest']
+
+    print(f"[Lamedb] Parsed v{model.version}: {len(model.transponders)} transponders, {len(model.services)} services from {path}")
+    return model
+
+
+# ---------------- provera ispravnosti ----------------
+
+def integrity_group(model, key, orbital):
+    """Grupa za izvestaj: orbital za satelit, 't'/'c' za DVB-T/C"""
+    system = model.system_for(key)
+    return orbital if system == "s" else system
+
+
+def check_integrity(model):
+    """
+    Jedan linearni prolaz kroz model: servisi bez transpondera, transponderi
+    bez servisa i dupli ref-ovi. Rezultat je grupisan po poziciji:
+    {grupa: {'orphans': [servis], 'unused': [transponder], 'duplicates': [[servis, ...]]}}
+    """
+    report = {}
+
+    def group(bucket):
+        entry = report.get(bucket)
+        if entry is None:
+            entry = report[bucket] = {'orphans': [], 'unused': [], 'duplicates': []}
+        return entry
+
+    transponders = model.transponders
+    seen = {}  # ref -> prvi servis ili lista duplikata
+    duplicates = {}
+    for service in model.services:
+        key = service.tp
+        if key not in transponders:
+            group(integrity_group(model, key, service.orbital))['orphans'].append(service)
+        ref = service.ref.lower()
+        first = seen.get(ref)
+        if first is None:
+            seen[ref] = service
+        elif ref in duplicates:
+            duplicates[ref].append(service)
+        else:
+            duplicates[ref] = [first, service]
+
+    services_by_tp = model.services_by_tp
+    for key, tp in transponders.items():
+        if key not in services_by_tp:
+            group(integrity_group(model, key, tp.orbital))['unused'].append(tp)
+
+    for services in duplicates.values():
+        first = services[0]
+        group(integrity_group(model, first.tp, first.orbital))['duplicates'].append(services)
+    return report
+
+
+# ---------------- pisanje (u formatu koji je procitan) ----------------
+
+def active_lamedb_path():
+    """lamedb5 ima prednost ako postoji (noviji OpenATV/OpenPLi image-i)"""
+    return LAMEDB5_PATH if os.path.exists(LAMEDB5_PATH) else LAMEDB_PATH
+
+
+def header_matches_ref(header, ref):
+    """Service header iz fajla (6 ili 7 polja) prema ref-u koji prikazuje Data Browser"""
+    header = header.strip().lower()
+    ref = ref.strip().lower()
+    return header == ref or header + ":0" == ref
+
+
+def transponder_lines(version, tp_key, prefix, params):
+    if version == 5:
+        return [f"t:{tp_key.lower()},{params_to_v5(prefix, params)}\n"]
+    return [tp_key.lower() + "\n", f"\t{prefix} {params}\n", "/\n"]
+
+
+def service_lines(version, ref, name, pline):
+    if version == 5:
+        line = f's:{ref.lower()},"{name}"'
+        if pline:
+            line += "," + pline
+        return [line + "\n"]
+    return [ref.lower() + "\n", name + "\n", pline + "\n"]
+
+
+class LamedbChanged(Exception):
+    """lamedb vise nije u stanju na kome se zasniva upis (prepisala ga je enigma2)"""
+
+
+def _fsync_dir(directory):
+    """Rename je trajan tek kad se i direktorijum upise na flash"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_replace(path, write, signature=None):
+    """
+    Jedini nacin na koji plugin menja lamedb. Pod advisory lock-om
+    (.<ime>.lock, flock) write(fd) puni privremeni fajl u istom direktorijumu,
+    koji se fsync-uje, stari fajl se zadrzava za backup store (hard link, bez
+    kopiranja), pa rename preko originala i fsync direktorijuma. Ako je zadat
+    signature, fajl mora i pod lock-om da bude u tom stanju.
+    -> (backup, novi signature, quick_digest novog fajla)
+    """
+    directory = os.path.dirname(path) or "."
+    base = os.path.basename(path)
+    tmp = os.path.join(directory, ".%s.tmp" % base)
+    lock = os.open(os.path.join(directory, ".%s.lock" % base), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if signature is not None and stat_signature(path) != signature:
+            raise LamedbChanged("lamedb changed on disk while saving: %s" % path)
+
+        dst = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            write(dst)
+            os.fsync(dst)
+        except BaseException:
+            os.close(dst)
+            os.unlink(tmp)
+            raise
+        os.close(dst)
+
+        pending = backups.hold_backup(path)
+        os.rename(tmp, path)
+        _fsync_dir(directory)
+        new_signature = stat_signature(path)
+        new_digest = quick_digest(path)
+    finally:
+        os.close(lock)
+    # Hesiranje i kompresija backup-a ne drze lock
+    return backups.store_backup(path, pending), new_signature, new_digest
+
+
+def write_atomic_with_backup(path, lines, signature=None):
+    """Ceo fajl iz lines (moze biti i generator koji jos cita original) -> kao atomic_replace"""
+    def write(fd):
+        with open(fd, "w", encoding="utf-8", errors="ignore", closefd=False) as f:
+            f.writelines(lines)
+    return atomic_replace(path, write, signature)
+
+
+def _header_key_ref(header):
+    """(kljuc transpondera, ref kao u Service.ref) iz service header-a, ili (None, None)"""
+    parsed = _parse_service_header(header.strip())
+    if not parsed:
+        return None, None
+    fields, sid, ns, tsid, onid = parsed[:5]
+    return (ns, tsid, onid), f"{sid:04x}:{':'.join(fields[1:6])}:0".lower()
+
+
+def _tp_key_of(key_str):
+    try:
+        ns_h, tsid_h, onid_h = key_str.strip().split(":")
+        return int(ns_h, 16), int(tsid_h, 16), int(onid_h, 16)
+    except ValueError:
+        return None
+
+
+def iter_compacted(path, keep_keys, counts):
+    """
+    Linije lamedb-a bez transpondera van keep_keys, bez servisa ciji transponder
+    nije u keep_keys i bez ponovljenih ref-ova (ostaje prvo pojavljivanje).
+    Cita se liniju po liniju; counts dobija 'transponders' i 'services' izbacene.
+    """
+    counts['transponders'] = counts['services'] = 0
+    seen = set()
+
+    def keep_service(header):
+        key, ref = _header_key_ref(header)
+        if key is None:
+            return True
+        if key not in keep_keys or ref in seen:
+            counts['services'] += 1
+            return False
+        seen.add(ref)
+        return True
+
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        first = f.readline()
+        yield first
+
+        if detect_version(first) == 5:
+            for line in f:
+                if line.startswith("t:"):
+                    if _tp_key_of(line[2:].split(",", 1)[0]) not in keep_keys:
+                        counts['transponders'] += 1
+                        continue
+                elif line.startswith("s:"):
+                    parts = split_v5_service(line.rstrip("\n"))
+                    if parts and not keep_service(parts[0]):
+                        continue
+                yield line
+            return
+
+        # v4: ista masina stanja kao _iter_v4, samo sto se linije prosledjuju ili preskacu
+        section = None
+        keep = True
+        in_tp = False
+        pending = 0  # broj linija servisa do sada (header, ime, pline, p:/c:/C:/f:)
+        for line in f:
+            stripped = line.strip()
+            if section is None:
+                if stripped in ("transponders", "services"):
+                    section = stripped
+                yield line
+                continue
+
+            if section == "transponders":
+                if stripped == "end" and not in_tp:
+                    section = None
+                    yield line
+                    continue
+                if not in_tp and stripped.count(":") == 2:
+                    in_tp = True
+                    keep = _tp_key_of(stripped) in keep_keys
+                    if not keep:
+                        counts['transponders'] += 1
+                elif in_tp and stripped == "/":
+                    in_tp = False
+                    if not keep:
+                        keep = True
+                        continue
+                if keep:
+                    yield line
+                continue
+
+            if pending:
+                if pending < 3 or stripped.startswith(("p:", "c:", "C:", "f:")):
+                    pending += 1
+                    if keep:
+                        yield line
+                    continue
+                pending = 0
+                keep = True
+
+            if stripped == "end":
+                section = None
+                yield line
+                continue
+            if _parse_service_header(stripped):
+                pending = 1
+                keep = keep_service(stripped)
+            if keep:
+                yield line
+
+
+def compact_lamedb(path):
+    """
+    Izbacuje servise bez transpondera, transpondere bez servisa i duple ref-ove
+    u jednom prolazu (atomski, uz backup). -> (backup, {'transponders': n, 'services': n})
+    """
+    with _cache_lock:
+        # Model mora da odgovara fajlu koji se upravo prepisuje
+        model = load_lamedb(path)
+        base_signature = model.signature
+        report = check_integrity(model)
+        keep_keys = set(k for k in model.transponders if k in model.services_by_tp)
+
+    counts = {}
+    bak, signature, digest = write_atomic_with_backup(path, iter_compacted(path, keep_keys, counts), base_signature)
+
+    def apply(model):
+        removed = []
+        for entry in report.values():
+            removed.extend(entry['orphans'])
+            for services in entry['duplicates']:
+                removed.extend(services[1:])
+        model.remove_services(removed)
+        for entry in report.values():
+            for tp in entry['unused']:
+                model.remove_transponder(tp.key)
+    update_cached_lamedb(path, base_signature, apply, signature, digest)
+    print(f"[Lamedb] Compacted {path}: removed {counts['transponders']} transponders, {counts['services']} services")
+    return bak, counts
+
+
+def restore_lamedb(path, backup):
+    """
+    Vraca lamedb iz backup store-a (isti atomski upis; trenutno stanje i samo
+    ide u store, pa restore moze da se ponisti). -> backup stanja pre restore-a
+    """
+    def write(fd):
+        with backups.open_backup(backup) as src, open(fd, "wb", closefd=False) as dst:
+            shutil.copyfileobj(src, dst, 65536)
+    bak = atomic_replace(path, write)[0]
+    invalidate_lamedb(path)
+    print(f"[Lamedb] Restored {path} from {backup}")
+    return bak
+
+
+# ---------------- izmene preko bajt ofseta (bez prepisivanja celog fajla) ----------------
+
+class RecordIndex(object):
+    """
+    Bajt ofseti zapisa u lamedb fajlu: [start, end) svakog transpondera i
+    servisa i mesta za ubacivanje novih. Vazi za tacno jedno stanje fajla
+    (signature); posle patch_lamedb se ne skenira ponovo, vec se pamti pomak
+    svakog upisa (sloj), a ofset zapisa se racuna tek kad se zatrazi.
+    """
+
+    MAX_LAYERS = 32
+
+    def __init__(self, path, version, signature):
+        self.path = path
+        self.version = version
+        self.signature = signature
+        self.digest = None  # quick_digest, poznat posle upisa plugina (patch_lamedb)
+        # (start, end, sloj): ofseti vaze posle upisa broj 'sloj', pomeraju se kroz novije slojeve
+        self.transponders = {}  # (namespace, tsid, onid) -> (start, end, sloj)
+        self.services = {}  # service header (mala slova) -> (start, end, sloj); vazi prvo pojavljivanje
+        self.tp_insert = 0
+        self.srv_insert = 0
+        self._layers = []  # [(kraj izmene, ukupni pomak)] po jednom upisu
+
+    def _resolve(self, entry):
+        if entry is None:
+            return None
+        start, end, layer = entry
+        length = end - start
+        for ends, deltas in self._layers[layer:]:
+            i = bisect.bisect_right(ends, start)
+            if i:
+                start += deltas[i - 1]
+        return [start, start + length]
+
+    def service_key(self, ref):
+        """Kljuc servisa u indeksu za ref iz Data Browser-a (isto poredjenje kao header_matches_ref)"""
+        ref = ref.strip().lower()
+        if ref not in self.services and ref.endswith(":0") and ref[:-2] in self.services:
+            return ref[:-2]
+        return ref
+
+    def find_service(self, ref):
+        return self._resolve(self.services.get(self.service_key(ref)))
+
+    def find_transponder(self, tp_key):
+        key = tp_key if isinstance(tp_key, tuple) else _tp_key_of(tp_key)
+        return self._resolve(self.transponders.get(key))
+
+    def read(self, span):
+        with open(self.path, "rb") as f:
+            f.seek(span[0])
+            return f.read(span[1] - span[0]).decode("utf-8", "ignore")
+
+    def apply(self, edits, signature, digest=None):
+        """
+        Posle patch_lamedb (edits sortirani kao tamo): izmenjeni zapisi se
+        premestaju pod nove kljuceve, a za sve ostale se pamti samo pomak.
+        """
+        layer = len(self._layers) + 1
+        ends = []
+        deltas = []
+        delta = 0
+        for start, end, data, kind, old_key, new_key in edits:
+            table = self.transponders if kind == "t" else self.services
+            if old_key is not None and self._resolve(table.get(old_key)) == [start, end]:
+                del table[old_key]
+            if new_key is not None and (kind == "t" or new_key not in table):
+                table[new_key] = (start + delta, start + delta + len(data), layer)
+            delta += len(data) - (end - start)
+            ends.append(end)
+            deltas.append(delta)
+
+        def move(offset):
+            i = bisect.bisect_right(ends, offset)
+            return offset + deltas[i - 1] if i else offset
+
+        self.tp_insert = move(self.tp_insert)
+        self.srv_insert = move(self.srv_insert)
+        self._layers.append((ends, deltas))
+        self.signature = signature
+        self.digest = digest
+        if len(self._layers) >= self.MAX_LAYERS:
+            self._flatten()
+
+    def _flatten(self):
+        for table in (self.transponders, self.services):
+            for key, entry in table.items():
+                start, end = self._resolve(entry)
+                table[key] = (start, end, 0)
+        self._layers = []
+
+
+def _index_v4(mm, index):
+    section = None
+    in_tp = False
+    tp_key = tp_start = None
+    pending = 0  # broj linija servisa do sada (header, ime, pline, p:/c:/C:/f: nastavci)
+    srv_start = srv_end = srv_header = None
+    pos = len(mm.readline())
+    size = len(mm)
+    while pos < size:
+        nl = mm.find(b"\n", pos)
+        end = size if nl < 0 else nl + 1
+        stripped = mm[pos:end].strip()
+
+        if section is None:
+            if stripped in (b"transponders", b"services"):
+                section = stripped
+        elif section == b"transponders":
+            if stripped == b"end" and not in_tp:
+                index.tp_insert = pos
+                section = None
+            elif not in_tp and stripped.count(b":") == 2:
+                in_tp = True
+                tp_key = _tp_key_of(stripped.decode("ascii", "ignore"))
+                tp_start = pos
+            elif in_tp and stripped == b"/":
+                in_tp = False
+                if tp_key is not None:
+                    index.transponders[tp_key] = (tp_start, end, 0)
+        else:
+            if pending:
+                # Zapis servisa obuhvata i nastavke provider linije, da bi brisanje bilo celo
+                if pending < 3 or stripped.startswith((b"p:", b"c:", b"C:", b"f:")):
+                    pending += 1
+                    srv_end = end
+                    pos = end
+                    continue
+                index.services.setdefault(srv_header, (srv_start, srv_end, 0))
+                pending = 0
+            if stripped == b"end":
+                index.srv_insert = pos
+                section = None
+            elif _parse_service_header(stripped.decode("ascii", "ignore")):
+                pending = 1
+                srv_start, srv_end = pos, end
+                srv_header = stripped.decode("ascii", "ignore").lower()
+        pos = end
+    if pending >= 3:
+        index.services.setdefault(srv_header, (srv_start, srv_end, 0))
+
+
+def _index_v5(mm, index):
+    pos = len(mm.readline())
+    index.tp_insert = pos
+    size = len(mm)
+    while pos < size:
+        nl = mm.find(b"\n", pos)
+        end = size if nl < 0 else nl + 1
+        if mm[pos:pos + 2] == b"t:":
+            comma = mm.find(b",", pos, end)
+            key = _tp_key_of(mm[pos + 2:comma if comma >= 0 else end].decode("ascii", "ignore"))
+            if key is not None:
+                index.transponders[key] = (pos, end, 0)
+            index.tp_insert = end
+        elif mm[pos:pos + 2] == b"s:":
+            comma = mm.find(b",", pos, end)
+            header = mm[pos + 2:comma if comma >= 0 else end].decode("ascii", "ignore").strip().lower()
+            index.services.setdefault(header, (pos, end, 0))
+            index.srv_insert = end
+        pos = end
+    if not index.srv_insert:
+        index.srv_insert = size
+
+
+# path -> RecordIndex (vazi dok se signature ne promeni); svoj lock, da ne ceka snapshot
+_offsets = {}
+_offsets_lock = threading.Lock()
+
+
+def record_index(path):
+    """Bajt ofseti zapisa za trenutno stanje fajla; skenira se samo kad se fajl promeni spolja"""
+    signature = stat_signature(path)
+    with _offsets_lock:
+        index = _offsets.get(path)
+        if index is not None and index.signature == signature:
+            return index
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise Exception("lamedb is empty: %s" % path)
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        index = RecordIndex(path, detect_version(mm.readline().decode("ascii", "ignore")), signature)
+        mm.seek(0)
+        (_index_v5 if index.version == 5 else _index_v4)(mm, index)
+    finally:
+        mm.close()
+    with _offsets_lock:
+        _offsets[path] = index
+    return index
+
+
+def service_edit(index, ref, header=None, name=None, pline=None):
+    """
+    Izmena jednog servisa kao edit za patch_lamedb; polja koja su None
+    ostaju kao u fajlu. -> (edit, (header, name, pline)) ili None ako ref nije nadjen
+    """
+    span = index.find_service(ref)
+    if span is None:
+        return None
+    text = index.read(span)
+    if index.version == 5:
+        current = split_v5_service(text.rstrip("\r\n"))
+        if not current:
+            return None
+    else:
+        block = text.splitlines(True)
+        current = [ln.strip() for ln in block[:3]]
+        if len(current) < 3:
+            return None
+    header = header if header is not None else current[0]
+    name = name if name is not None else current[1]
+    pline = pline if pline is not None else current[2]
+    lines = service_lines(index.version, header, name, pline)
+    if index.version != 5:
+        # p:/c:/C:/f: nastavci provider linije ostaju kakvi su bili
+        lines.extend(block[3:])
+    data = "".join(lines).encode("utf-8")
+    edit = (span[0], span[1], data, "s", current[0].strip().lower(), header.strip().lower())
+    return edit, (header.strip(), name.strip(), pline.strip())
+
+
+def transponder_edit(index, tp_key, prefix, params):
+    """Zamena postojeceg transpondera; novi se ubacuje na kraj transponders sekcije"""
+    key = _tp_key_of(tp_key)
+    if key is None:
+        return None
+    data = "".join(transponder_lines(index.version, tp_key, prefix, params)).encode("utf-8")
+    span = index.find_transponder(key)
+    if span is None:
+        return (index.tp_insert, index.tp_insert, data, "t", None, key)
+    return (span[0], span[1], data, "t", key, key)
+
+
+def service_insert(index, header, name, pline):
+    data = "".join(service_lines(index.version, header, name, pline)).encode("utf-8")
+    return (index.srv_insert, index.srv_insert, data, "s", None, header.strip().lower())
+
+
+def delete_edit(index, kind, key):
+    """Brisanje celog zapisa ('t': kljuc transpondera, 's': ref servisa) kao edit za patch_lamedb"""
+    if kind == "t":
+        span = index.find_transponder(key)
+        old_key = key if isinstance(key, tuple) else _tp_key_of(key)
+    else:
+        old_key = index.service_key(key)
+        span = index.find_service(key)
+    if span is None:
+        return None
+    return (span[0], span[1], b"", kind, old_key, None)
+
+
+class TransactionError(Exception):
+    """Izmene u transakciji ne prolaze proveru nad modelom; errors je lista poruka"""
+
+    def __init__(self, errors):
+        Exception.__init__(self, "\n".join(errors))
+        self.errors = errors
+
+
+class ConflictError(TransactionError):
+    """Zapisi iz transakcije su u medjuvremenu promenjeni spolja; nista nije upisano"""
+
+
+def record_base(path, kind, key):
+    """
+    Verzija zapisa na kojoj se zasniva izmena ('s': ref, 't': kljuc
+    transpondera): (signature, tekst zapisa ili None ako ga nema). Editor je
+    uzima kad otvori zapis; commit po njoj proverava da li je enigma2 u
+    medjuvremenu promenila isti zapis.
+    """
+    index = record_index(path)
+    span = index.find_transponder(key) if kind == "t" else index.find_service(key)
+    return index.signature, index.read(span) if span else None
+
+
+def _service_id(ref):
+    """(sid, namespace, tsid, onid) iz ref-a ili header-a, ili None"""
+    parsed = _parse_service_header(ref.strip())
+    return parsed[1:5] if parsed else None
+
+
+class LamedbTransaction(object):
+    """
+    Izmene koje se skupljaju (editor, fake T2MI, Data Browser) i upisuju
+    odjednom: provera nad indeksiranim modelom, jedan patch_lamedb i jedna
+    izmena kesiranog modela. Reload baze radi pozivalac, jednom po commit-u.
+    Vise izmena istog zapisa se spaja; vazi poslednja.
+
+    Za svaki menjani ili brisani zapis pamti se verzija na kojoj se izmena
+    zasniva (record_base; zadaje je editor, inace se uzima pri dodavanju).
+    Ako je enigma2 u medjuvremenu prepisala lamedb, izmena se prenosi na novi
+    sadrzaj preko indeksa ako su ti zapisi ostali isti, a inace ConflictError.
+    """
+
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, path=None):
+        self.path = path or active_lamedb_path()
+        self._services = {}  # (sid, ns, tsid, onid) -> [operacija, ref, header, ime, pline]
+        self._transponders = {}  # (namespace, tsid, onid) -> [operacija, tp_key, prefix, params]
+        self._bases = {}  # ('s', service id) / ('t', kljuc TP-a) -> (ref / tp_key, record_base)
+
+    def __len__(self):
+        return len(self._services) + len(self._transponders)
+
+    def clear(self):
+        self._services.clear()
+        self._transponders.clear()
+        self._bases.clear()
+
+    def _remember(self, kind, key, ref, base):
+        # Vazi prva verzija: kasnije izmene istog zapisa se nadovezuju na nju
+        if (kind, key) not in self._bases:
+            self._bases[(kind, key)] = (ref, base if base is not None else record_base(self.path, kind, ref))
+
+    def _service_op(self, ref):
+        key = _service_id(ref)
+        if key is None:
+            raise TransactionError(["Invalid service reference: %s" % ref])
+        return key, self._services.get(key)
+
+    def update_service(self, ref, header=None, name=None, pline=None, base=None):
+        """Izmena postojeceg servisa; None polja ostaju kao u fajlu"""
+        key, op = self._service_op(ref)
+        if op is None:
+            self._remember("s", key, ref.strip(), base)
+            self._services[key] = ["update", ref.strip(), header, name, pline]
+            return
+        if op[0] == "delete":
+            raise TransactionError(["Service is already queued for deletion: %s" % ref])
+        for i, value in ((2, header), (3, name), (4, pline)):
+            if value is not None:
+                op[i] = value
+
+    def insert_service(self, header, name, pline):
+        key, op = self._service_op(header)
+        if op is not None and op[0] == "delete":
+            # Brisanje pa ponovno dodavanje istog servisa je izmena
+            self._services[key] = ["update", op[1], header, name, pline]
+        else:
+            self._services[key] = ["insert", header.strip(), header.strip(), name, pline]
+
+    def delete_service(self, ref, base=None):
+        key, op = self._service_op(ref)
+        if op is not None and op[0] == "insert":
+            del self._services[key]
+        else:
+            if op is None:
+                self._remember("s", key, ref.strip(), base)
+            self._services[key] = ["delete", ref.strip() if op is None else op[1], None, None, None]
+
+    def put_transponder(self, tp_key, prefix, params, base=None):
+        """Izmena postojeceg ili dodavanje novog transpondera"""
+        key = _tp_key_of(tp_key)
+        if key is None:
+            raise TransactionError(["Invalid transponder key: %s" % tp_key])
+        self._remember("t", key, tp_key, base)
+        self._transponders[key] = ["put", tp_key, prefix, params]
+
+    def update_transponder(self, tp_key, prefix, params, base=None):
+        """Izmena transpondera koji mora vec da postoji (editor ne dodaje nove)"""
+        key = _tp_key_of(tp_key)
+        if key is None:
+            raise TransactionError(["Invalid transponder key: %s" % tp_key])
+        self._remember("t", key, tp_key, base)
+        self._transponders[key] = ["update", tp_key, prefix, params]
+
+    def delete_transponder(self, tp_key, base=None):
+        key = _tp_key_of(tp_key)
+        if key is None:
+            raise TransactionError(["Invalid transponder key: %s" % tp_key])
+        self._remember("t", key, tp_key, base)
+        self._transponders[key] = ["delete", tp_key, None, None]
+
+    def _has_transponder(self, model, key):
+        op = self._transponders.get(key)
+        if op is not None:
+            return op[0] != "delete"
+        return key in model.transponders
+
+    def validate(self, model, index):
+        """-> lista gresaka (prazna ako sve izmene mogu da se upisu)"""
+        errors = []
+        for key, (op, ref, header, name, pline) in self._services.items():
+            exists = index.find_service(ref) is not None
+            if op in ("update", "delete") and not exists:
+                errors.append("Service not found: %s" % ref)
+                continue
+            if op == "insert" and exists:
+                errors.append("Service already exists: %s" % ref)
+                continue
+            if header is None:
+                continue
+            new_key = _service_id(header)
+            if new_key is None:
+                errors.append("Invalid service reference: %s" % header)
+                continue
+            if new_key != key and (index.find_service(header) is not None or new_key in self._services):
+                errors.append("Service already exists: %s" % header)
+            if not self._has_transponder(model, new_key[1:]):
+                errors.append("No transponder %08x:%04x:%04x for service %s" % (new_key[1:] + (header,)))
+
+        for key, (op, tp_key, prefix, params) in self._transponders.items():
+            if op == "put":
+                continue
+            if index.find_transponder(key) is None:
+                errors.append("Transponder not found: %s" % tp_key)
+                continue
+            if op == "update":
+                continue
+            remaining = [s for s in model.services_by_tp.get(key, ())
+                         if (s.sid, s.namespace, s.tsid, s.onid) not in self._services
+                         or self._services[(s.sid, s.namespace, s.tsid, s.onid)][0] != "delete"]
+            if remaining:
+                errors.append("Transponder %s still has %d services" % (tp_key, len(remaining)))
+        return errors
+
+    def _edits(self, index):
+        """-> (edits za patch_lamedb, koraci za kesirani model)"""
+        edits = []
+        tp_steps = []
+        service_steps = []
+        delete_steps = []
+        for key, (op, tp_key, prefix, params) in self._transponders.items():
+            if op != "delete":
+                edits.append(transponder_edit(index, tp_key, prefix, params))
+                tp_steps.append(lambda model, a=(tp_key, prefix, params): model.put_transponder(*a))
+            else:
+                edits.append(delete_edit(index, "t", key))
+                delete_steps.append(lambda model, k=key: model.remove_transponder(k))
+
+        for op, ref, header, name, pline in self._services.values():
+            if op == "update":
+                edit, lines = service_edit(index, ref, header, name, pline)
+                edits.append(edit)
+                service_steps.append(lambda model, r=ref, a=lines: model.replace_service(r, *a))
+            elif op == "insert":
+                edits.append(service_insert(index, header, name, pline))
+                service_steps.append(lambda model, a=(header, name, pline): model.add_service(model.service_from_lines(*a)))
+            else:
+                edits.append(delete_edit(index, "s", ref))
+                service_steps.append(lambda model, r=ref: model.remove_service(model.find_service(r)))
+        # Transponderi pre servisa (servis prati orbital TP-a), brisanje TP-ova na kraju
+        return edits, tp_steps + service_steps + delete_steps
+
+    def conflicts(self, index):
+        """
+        Zapisi koji vise nisu kao u verziji na kojoj se izmena zasniva. Kad se
+        fajl nije menjao (uobicajen slucaj) nista se ne cita; inace se porede
+        samo tekstovi tih zapisa preko indeksa.
+        """
+        conflicts = []
+        for (kind, _), (ref, (signature, text)) in self._bases.items():
+            if signature == index.signature:
+                continue
+            span = index.find_transponder(ref) if kind == "t" else index.find_service(ref)
+            if (index.read(span) if span else None) != text:
+                what = "Transponder" if kind == "t" else "Service"
+                conflicts.append("%s %s was changed outside the plugin (enigma2 rewrote lamedb)" % (what, ref))
+        return conflicts
+
+    def commit(self, label=None, journal=True):
+        """
+        Provera, pa jedan upis svih izmena. -> backup ili None ako nema izmena;
+        TransactionError ako provera ne prodje, ConflictError ako su isti zapisi
+        promenjeni spolja (fajl se tada ne menja). Upis ide u edit_journal
+        (label je opis za Undo/Redo), osim kad je i sam undo/redo.
+        """
+        if not self:
+            return None
+        for attempt in range(self.MAX_ATTEMPTS):
+            model = load_lamedb(self.path)
+            index = record_index(self.path)
+            conflicts = self.conflicts(index)
+            if conflicts:
+                raise ConflictError(conflicts + ["Reopen the entry and apply the change again."])
+            errors = self.validate(model, index)
+            if errors:
+                raise TransactionError(errors)
+
+            edits, steps = self._edits(index)
+            # Za journal: samo stari i novi tekst izmenjenih zapisa
+            records = [(kind, index.read((start, end)) if end > start else None, data.decode("utf-8") or None)
+                       for start, end, data, kind, _, _ in edits] if journal else None
+            base_signature = index.signature  # patch_lamedb pomera indeks na novo stanje fajla
+            try:
+                bak = patch_lamedb(index, edits)
+            except LamedbChanged:
+                # enigma2 je upisala izmedju provere i lock-a: ponovo, nad novim sadrzajem
+                print(f"[Lamedb] {self.path} changed while saving, rebasing (attempt {attempt + 1})")
+                continue
+
+            def apply(model):
+                for step in steps:
+                    step(model)
+            update_cached_lamedb(self.path, base_signature, apply, index.signature, index.digest)
+            if journal:
+                edit_journal(self.path).record(JournalEntry(label or "%d changes" % len(self), index.version, records))
+            print(f"[Lamedb] Committed {len(self)} changes to {self.path} in one write")
+            self.clear()
+            return bak
+        raise LamedbChanged("lamedb keeps changing on disk, try again later: %s" % self.path)
+
+
+def _record_fields(version, kind, text):
+    """Tekst zapisa -> (tp_key, prefix, params) za transponder, (header, ime, pline) za servis"""
+    if kind == "t":
+        if version == 5:
+            key, _, feparams = text.strip()[2:].partition(",")
+            return (key,) + params_from_v5(feparams)
+        lines = text.splitlines()
+        prefix, _, params = lines[1].strip().partition(" ")
+        return lines[0].strip(), prefix, params
+    if version == 5:
+        return split_v5_service(text.rstrip("\r\n"))
+    return tuple(line.strip() for line in text.splitlines()[:3])
+
+
+class JournalEntry(object):
+    """Jedan commit: [(vrsta, stari tekst, novi tekst)] izmenjenih zapisa (None = zapis nije postojao)"""
+
+    def __init__(self, label, version, records):
+        self.label = label
+        self.version = version
+        self.records = records
+        self.time = time.time()
+
+    def transaction(self, path, undo):
+        """
+        Transakcija koja fajl vodi iz stanja posle commit-a u stanje pre njega
+        (undo) ili obrnuto (redo). Ocekivani tekst zapisa je baza, pa se zapisi
+        koji su u medjuvremenu promenjeni prijavljuju kao ConflictError.
+        """
+        transaction = LamedbTransaction(path)
+        for kind, old, new in self.records:
+            current, target = (new, old) if undo else (old, new)
+            base = (None, current)
+            if kind == "t":
+                if target is None:
+                    transaction.delete_transponder(_record_fields(self.version, kind, current)[0], base=base)
+                else:
+                    transaction.put_transponder(*_record_fields(self.version, kind, target), base=base)
+            elif current is None:
+                transaction.insert_service(*_record_fields(self.version, kind, target))
+            elif target is None:
+                transaction.delete_service(_record_fields(self.version, kind, current)[0], base=base)
+            else:
+                header = _record_fields(self.version, kind, current)[0]
+                transaction.update_service(header, *_record_fields(self.version, kind, target), base=base)
+        return transaction
+
+    def follow(self, ref, undo):
+        """
+        Gde je servis ref posle undo/redo ovog commit-a: (True, (header, ime,
+        pline)) ili (True, None) ako je obrisan; (False, None) ako ga commit ne menja.
+        """
+        for kind, old, new in self.records:
+            current, target = (new, old) if undo else (old, new)
+            if kind == "s" and current is not None:
+                if header_matches_ref(_record_fields(self.version, kind, current)[0], ref):
+                    return True, _record_fields(self.version, kind, target) if target is not None else None
+        return False, None
+
+
+class EditJournal(object):
+    """
+    Undo/redo za jednu sesiju (dok radi enigma2): cuvaju se samo tekstovi
+    izmenjenih zapisa, a vracanje ide kroz isti indeksirani patch kao i izmena.
+    """
+
+    MAX_ENTRIES = 50
+
+    def __init__(self, path):
+        self.path = path
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def record(self, entry):
+        self.undo_stack.append(entry)
+        del self.undo_stack[:-self.MAX_ENTRIES]
+        del self.redo_stack[:]
+
+    def undo(self):
+        """Vraca poslednji commit -> JournalEntry; greska ostavlja journal kakav je bio"""
+        entry = self.undo_stack[-1]
+        entry.transaction(self.path, undo=True).commit(journal=False)
+        self.redo_stack.append(self.undo_stack.pop())
+        return entry
+
+    def redo(self):
+        entry = self.redo_stack[-1]
+        entry.transaction(self.path, undo=False).commit(journal=False)
+        self.undo_stack.append(self.redo_stack.pop())
+        return entry
+
+
+# path -> EditJournal
+_journals = {}
+
+
+def edit_journal(path):
+    journal = _journals.get(path)
+    if journal is None:
+        journal = _journals[path] = EditJournal(path)
+    return journal
+
+
+# copy_file_range/sendfile kopiraju delove fajla u kernelu; posle prve greske se ne pokusavaju ponovo
+_fast_copy = {"copy_file_range": hasattr(os, "copy_file_range"), "sendfile": hasattr(os, "sendfile")}
+
+
+def _copy_range(src, dst, offset, count):
+    """count bajtova iz src (od offset) na trenutnu poziciju dst (oba su fd)"""
+    if _fast_copy["copy_file_range"]:
+        try:
+            while count > 0:
+                n = os.copy_file_range(src, dst, count, offset)
+                if n <= 0:
+                    break
+                offset += n
+                count -= n
+        except OSError:
+            _fast_copy["copy_file_range"] = False
+    if count > 0 and _fast_copy["sendfile"]:
+        try:
+            while count > 0:
+                n = os.sendfile(dst, src, offset, count)
+                if n <= 0:
+                    break
+                offset += n
+                count -= n
+        except OSError:
+            _fast_copy["sendfile"] = False
+    while count > 0:
+        chunk = os.pread(src, min(count, 65536), offset)
+        if not chunk:
+            break
+        os.write(dst, chunk)
+        offset += len(chunk)
+        count -= len(chunk)
+    if count > 0:
+        raise Exception("lamedb changed while patching")
+
+
+def patch_lamedb(index, edits):
+    """
+    Upisuje samo izmenjene zapise: delovi fajla izmedju edits se kopiraju u
+    kernelu (copy_file_range/sendfile), a novi sadrzaj se upisuje na njihovo
+    mesto. edits: [(start, end, bytes, 't'/'s', stari kljuc, novi kljuc)].
+    Upis ide kroz atomic_replace. -> backup
+    """
+    path = index.path
+    edits = sorted(edits, key=lambda e: (e[0], e[1]))
+    for previous, current in zip(edits, edits[1:]):
+        if current[0] < previous[1]:
+            raise Exception("Overlapping lamedb edits")
+
+    def write(dst):
+        # Original se otvara tek pod lock-om, posle provere potpisa
+        src = os.open(path, os.O_RDONLY)
+        try:
+            size = os.fstat(src).st_size
+            pos = 0
+            for start, end, data, _, _, _ in edits:
+                _copy_range(src, dst, pos, start - pos)
+                os.write(dst, data)
+                pos = end
+            _copy_range(src, dst, pos, size - pos)
+        finally:
+            os.close(src)
+    bak, signature, digest = atomic_replace(path, write, index.signature)
+
+    with _offsets_lock:
+        index.apply(edits, signature, digest)
+        _offsets[path] = index
+    return bak
+
+
+def stat_signature(path):
+    """(mtime, size, inode) - menja se cim enigma2 ili plugin prepise lamedb"""
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def snapshot_path(path):
+    """Binarni snapshot stoji pored lamedb-a: /etc/enigma2/.ciefp_lamedb.snapshot"""
+    return os.path.join(os.path.dirname(path), ".ciefp_%s.snapshot" % os.path.basename(path))
+
+
+def _sampled_digest(size, read):
+    h = hashlib.md5(b"%d:" % size)
+    if size <= DIGEST_BLOCK * DIGEST_SAMPLES:
+        if size:
+            h.update(read(0, size))
+    else:
+        step = (size - DIGEST_BLOCK) // (DIGEST_SAMPLES - 1)
+        for i in range(DIGEST_SAMPLES):
+            h.update(read(i * step, DIGEST_BLOCK))
+    return h.hexdigest()
+
+
+def quick_digest(path):
+    """
+    Jeftin otisak sadrzaja lamedb-a (oko 64 KB citanja i za 100k servisa).
+    Ne dokazuje da je fajl isti, vec uz stat potpis hvata fajl vracen sa
+    starim mtime-om (restore, kopija sa racunara) pre nego sto se veruje snapshot-u.
+    """
+    with open(path, "rb") as f:
+        fd = f.fileno()
+        return _sampled_digest(os.fstat(fd).st_size, lambda offset, count: os.pread(fd, count, offset))
+
+
+# Kolone servisa u snapshot-u, redom kao argumenti Service(...)
+SERVICE_TEXT = ("_ref", "_name", "_pline", "_pids")
+SERVICE_INTS = ("sid", "namespace", "tsid", "onid", "stype", "flags", "orbital")
+
+
+def _text_column(values):
+    # Linije lamedb-a nemaju \n; bytes (jos nedekodirano) ide kako jeste
+    return b"\n".join(v if v.__class__ is bytes else v.encode("utf-8") for v in values)
+
+
+def _stored_ref(service):
+    """Ref za snapshot: b"" kad je isti kao canonical_ref() (uobicajeno), inace tekst iz fajla"""
+    value = service._ref
+    if value.__class__ is bytes:
+        value = service._decode_ref(value)
+    return b"" if value == service.canonical_ref() else value
+
+
+def _int_column(values):
+    """Brojevi kao (typecode, bytes) najmanjeg array tipa u koji staju"""
+    for code in ("H", "I", "q"):
+        try:
+            return code, array(code, values).tobytes()
+        except OverflowError:
+            continue
+    raise OverflowError("value out of range for snapshot column")
+
+
+def _ints(column):
+    code, data = column
+    values = array(code)
+    values.frombytes(data)
+    return values
+
+
+def _dump_groups(groups, positions):
+    """{kljuc: [servis, ...]} -> (kljucevi, duzine, pozicije servisa u model.services)"""
+    keys = list(groups)
+    return (keys, _int_column([len(groups[k]) for k in keys]),
+            _int_column([positions[id(s)] for k in keys for s in groups[k]]))
+
+
+def _load_groups(services, groups):
+    keys, lengths, order = groups
+    order = _ints(order)
+    get = services.__getitem__
+    result = {}
+    pos = 0
+    for key, n in zip(keys, _ints(lengths)):
+        result[key] = list(map(get, order[pos:pos + n]))
+        pos += n
+    return result
+
+
+def dump_model(model):
+    """
+    Model kao kolone (za snapshot i za prenos iz drugog procesa): tekst
+    servisa je jedan bytes blok po polju, brojevi su array-i, a indeksi i
+    zbirovi idu gotovi (pozicije servisa), pa ucitavanje ne ponavlja add_service.
+    """
+    services = model.services
+    positions = {id(s): i for i, s in enumerate(services)}
+    return (
+        model.version,
+        [list(column) for column in zip(*[tp.to_tuple() for tp in model.transponders.values()])],
+        len(services),
+        [_text_column([_stored_ref(s) for s in services] if attr == "_ref" else [getattr(s, attr) for s in services])
+         for attr in SERVICE_TEXT],
+        [_int_column([getattr(s, attr) for s in services]) for attr in SERVICE_INTS],
+        _dump_groups(model.services_by_tp, positions),
+        _dump_groups(model.by_provider, positions),
+        _dump_groups(model.by_caid, positions),
+        model.by_orbital,
+        model.by_system,
+        (model.tp_counts, model.orbital_counts, model.system_counts, model.category_counts, model.fta_count),
+    )
+
+
+def build_model(path, digest, payload):
+    """Obrnuto od dump_model"""
+    (version, tp_columns, count, texts, ints, by_tp, by_provider, by_caid,
+     by_orbital, by_system, counts) = payload
+    model = LamedbModel(path)
+    model.digest = digest
+    model.version = version
+    if tp_columns:
+        model.transponders = dict(zip(zip(*tp_columns[:3]), map(Transponder, *tp_columns)))
+    columns = [block.split(b"\n") if count else [] for block in texts] + [_ints(column) for column in ints]
+    services = model.services = list(map(Service, *columns))
+    model.services_by_tp = _load_groups(services, by_tp)
+    model.by_provider = _load_groups(services, by_provider)
+    model.by_caid = _load_groups(services, by_caid)
+    model.by_orbital = by_orbital
+    model.by_system = by_system
+    model.tp_counts, model.orbital_counts, model.system_counts, model.category_counts, model.fta_count = counts
+    return model
+
+
+# Jedan upis snapshot-a u isto vreme (isti .tmp fajl)
+_snapshot_lock = threading.Lock()
+# path -> model ciji snapshot jos nije upisan (mark_snapshot_stale)
+_stale = {}
+_stale_lock = threading.Lock()
+_stale_timer = None
+
+
+def save_snapshot(model):
+    with _snapshot_lock:
+        _write_snapshot(model)
+
+
+def _write_snapshot(model):
+    # Pod lock-om: model moze da se menja inkrementalno (update_cached_lamedb)
+    with _cache_lock:
+        mtime_ns, size = model.signature[:2] if model.signature else stat_signature(model.path)[:2]
+        payload = marshal.dumps((SNAPSHOT_VERSION, size, mtime_ns, model.digest, dump_model(model)))
+    target = snapshot_path(model.path)
+    tmp = target + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(payload)
+    os.replace(tmp, target)
+    print(f"[Lamedb] Snapshot saved: {target} ({len(payload)} bytes)")
+
+
+def load_snapshot(path, stats=None):
+    """
+    Model iz snapshot-a, ili None ako snapshot ne postoji ili ne odgovara
+    lamedb-u (stat potpis + quick_digest). Kao i parse_lamedb, prekida se
+    sa stats['cancel']; stats['snapshot'] oznacava da je citanje pocelo od snapshot-a.
+    """
+    if stats is None:
+        stats = {}
+    stats['snapshot'] = True
+    try:
+        with open(snapshot_path(path), "rb") as f:
+            version, size, mtime_ns, digest, payload = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if stats.get('cancel'):
+        raise LoadCancelled()
+
+    st = os.stat(path)
+    if version != SNAPSHOT_VERSION or size != st.st_size or mtime_ns != st.st_mtime_ns:
+        return None
+    if digest != quick_digest(path):
+        return None
+
+    try:
+        model = build_model(path, digest, payload)
+    except (ValueError, TypeError, IndexError):
+        return None
+    if stats.get('cancel'):
+        raise LoadCancelled()
+    print(f"[Lamedb] Loaded snapshot: {len(model.transponders)} transponders, {len(model.services)} services")
+    return model
+
+
+def _save_snapshot_async(model):
+    def run():
+        try:
+            save_snapshot(model)
+        except Exception as e:
+            print(f"[Lamedb] Error saving snapshot: {e}")
+    threading.Thread(target=run, name="LamedbSnapshot", daemon=True).start()
+
+
+def mark_snapshot_stale(model):
+    """Snapshot vise ne odgovara modelu; upisuje ga flush_snapshots posle SNAPSHOT_DELAY"""
+    global _stale_timer
+    with _stale_lock:
+        _stale[model.path] = model
+        if _stale_timer is not None:
+            _stale_timer.cancel()
+        _stale_timer = threading.Timer(SNAPSHOT_DELAY, flush_snapshots)
+        _stale_timer.daemon = True
+        _stale_timer.start()
+
+
+def flush_snapshots():
+    """Upisuje zaostale snapshot-e; model koji je u medjuvremenu izbacen iz kesa se preskace"""
+    global _stale_timer
+    with _stale_lock:
+        if _stale_timer is not None:
+            _stale_timer.cancel()
+            _stale_timer = None
+        models = list(_stale.values())
+        _stale.clear()
+    for model in models:
+        with _cache_lock:
+            cached = _cache.get(model.path)
+            current = cached is not None and cached[1] is model
+        if not current:
+            continue
+        try:
+            save_snapshot(model)
+        except Exception as e:
+            print(f"[Lamedb] Error saving snapshot: {e}")
+
+
+def flush_snapshots_async():
+    """Za zatvaranje ekrana: upis ne zadrzava UI"""
+    if _stale:
+        threading.Thread(target=flush_snapshots, name="LamedbSnapshot", daemon=True).start()
+
+
+def load_lamedb(path=LAMEDB_PATH, stats=None):
+    """
+    Parsirani lamedb iz kesa. Redosled: memorija, binarni snapshot,
+    pa tek onda tekstualni parse (posle koga se snapshot obnavlja u pozadini).
+    stats se prosledjuje parse_lamedb-u (napredak i prekid).
+    """
+    signature = stat_signature(path)
+    # Bez lock-a: _write_snapshot ga drzi dok pravi snapshot, a citanje kesa
+    # ne sme da ceka na to (glavna nit)
+    cached = _cache.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    # Snapshot/parse van lock-a; lock samo za ulazak u kes
+    model = load_snapshot(path, stats)
+    model_parsed = model is None
+    if model_parsed:
+        model = parse_lamedb(path, stats)
+    model.signature = signature
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == signature:
+            # Druga nit je u medjuvremenu ucitala isti fajl
+            return cached[1]
+        if stat_signature(path) != signature:
+            # Fajl je promenjen tokom citanja; model se vraca, ali ne kesira
+            return model
+        _cache[path] = (signature, model)
+    if model_parsed:
+        _save_snapshot_async(model)
+    return model
+
+
+def update_cached_lamedb(path, base_signature, apply, signature, digest):
+    """
+    Posle upisa plugina: izmena se primenjuje na kesirani model (apply(model))
+    umesto ponovnog parse-a. signature i digest novog fajla daje sam upis
+    (atomic_replace), pa se fajl ne cita ponovo; snapshot se samo oznacava
+    kao zastareo. Ako kes ne odgovara stanju fajla pre upisa (base_signature),
+    kes se samo brise.
+    """
+    with _cache_lock:
+        cached = _cache.get(path)
+        if not cached or cached[0] != base_signature:
+            _cache.pop(path, None)
+            return None
+        model = cached[1]
+        try:
+            apply(model)
+        except Exception as e:
+            print(f"[Lamedb] Incremental update failed, dropping cache: {e}")
+            _cache.pop(path, None)
+            return None
+        model.signature = signature
+        model.digest = digest
+        _cache[path] = (signature, model)
+    mark_snapshot_stale(model)
+    return model
+
+
+def install_lamedb(model):
+    """
+    Model parsiran van kesa (npr. u drugom procesu) ulazi u kes samo ako
+    fajl od tada nije menjan i kes jos nema taj model.
+    """
+    with _cache_lock:
+        try:
+            signature = stat_signature(model.path)
+        except OSError:
+            return False
+        if signature != model.signature:
+            return False
+        cached = _cache.get(model.path)
+        if cached and cached[0] == signature:
+            return False
+        _cache[model.path] = (signature, model)
+    return True
+
+
+def model_lock():
+    """
+    Lock pod kojim se kesirani model menja (update_cached_lamedb); nit koja
+    cita njegove indekse van glavne niti ga drzi dok ih cita.
+    """
+    return _cache_lock
+
+
+def invalidate_lamedb(path=LAMEDB_PATH):
+    """Poziva se posle svakog upisa plugina u lamedb"""
+    with _cache_lock:
+        _cache.pop(path, None)
@@ -0,0 +1,149 @@
+import marshal
+import multiprocessing
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from Plugins.Extensions.CiefpSatelliteAnalyzer import lamedb
+
+SATELLITES_XML = "/etc/tuxbox/satellites.xml"
+
+# Ucitavanje u zasebnim procesima je opciono (config preload_processes):
+# enigma2 je visenitni proces pa se ne fork-uje, procesi se pokrecu sa spawn
+# i posebnim python interpreterom. Podrazumevano (i na jednojezgarnim
+# risiverima) sve se radi redom u jednoj pozadinskoj niti.
+PRELOAD_IN_PROCESSES = False
+PYTHON_EXECUTABLE = "/usr/bin/python3"
+MAX_WORKERS = 3
+# Sekundi za sve poslove u procesima; posle toga se rezultati ne cekaju
+PRELOAD_TIMEOUT = 120
+
+# path -> (stat potpis, rezultat) za satellites.xml
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def parse_satellites(path=SATELLITES_XML):
+    """satellites.xml -> {pozicija (-1800..1800): ime}"""
+    names = {}
+    for sat in ET.parse(path).getroot().iter("sat"):
+        try:
+            names[int(sat.get("position", "0"))] = sat.get("name", "")
+        except ValueError:
+            continue
+    return names
+
+
+# ---------------- poslovi za radne procese (bez enigma2 importa) ----------------
+
+def _lamedb_job(path):
+    # Radni proces samo cita; snapshot u /etc/enigma2 upisuje glavni proces
+    signature = lamedb.stat_signature(path)
+    model = lamedb.load_snapshot(path)
+    parsed = model is None
+    if parsed:
+        model = lamedb.parse_lamedb(path)
+    # marshal umesto pickle-a: brze i manje za 100k servisa
+    return marshal.dumps((signature, model.digest, parsed, lamedb.dump_model(model)))
+
+
+def _satellites_job(path):
+    return _signature(path), parse_satellites(path)
+
+
+# ---------------- rezultati u glavnom procesu ----------------
+
+def _install_lamedb(path, payload):
+    signature, digest, parsed, model_payload = marshal.loads(payload)
+    model = lamedb.build_model(path, digest, model_payload)
+    model.signature = signature
+    if lamedb.install_lamedb(model):
+        print(f"[Preload] lamedb ready: {len(model.services)} services")
+        if parsed:
+            # Snapshot nije postojao ili je zastareo; upisuje se zajedno sa ostalim upisima snapshot-a
+            lamedb.mark_snapshot_stale(model)
+
+
+def _install(path, signature, value):
+    with _cache_lock:
+        _cache[path] = (signature, value)
+
+
+def _cached(path, parse):
+    """Rezultat iz kesa ako fajl nije menjan, inace parse(path) (i upis u kes)"""
+    signature = _signature(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    value = parse(path)
+    _install(path, signature, value)
+    return value
+
+
+def satellite_names(path=SATELLITES_XML):
+    if not os.path.exists(path):
+        return {}
+    return _cached(path, parse_satellites)
+
+
+def _run_jobs(jobs, use_processes):
+    """jobs: [(ime, funkcija, argument, install(rezultat))]"""
+    if use_processes:
+        try:
+            context = multiprocessing.get_context("spawn")
+            # sys.executable je u enigma2 sam enigma2 binarni fajl
+            context.set_executable(PYTHON_EXECUTABLE)
+            pool = ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(jobs)), mp_context=context)
+            futures = [(name, pool.submit(func, arg), install) for name, func, arg, install in jobs]
+        except Exception as e:
+            print(f"[Preload] Process pool unavailable, loading in thread: {e}")
+        else:
+            deadline = time.monotonic() + PRELOAD_TIMEOUT
+            try:
+                for name, future, install in futures:
+                    try:
+                        install(future.result(timeout=max(0, deadline - time.monotonic())))
+                    except FutureTimeout:
+                        print(f"[Preload] {name} timed out")
+                    except Exception as e:
+                        print(f"[Preload] {name} failed: {e}")
+            finally:
+                # Zaglavljen radni proces ne zadrzava ovu nit
+                pool.shutdown(wait=False, cancel_futures=True)
+            return
+
+    for name, func, arg, install in jobs:
+        try:
+            install(func(arg))
+        except Exception as e:
+            print(f"[Preload] {name} failed: {e}")
+
+
+def preload_async(lamedb_path, satellites_path=SATELLITES_XML, in_processes=PRELOAD_IN_PROCESSES):
+    """
+    lamedb i satellites.xml se parsiraju unapred (uz in_processes paralelno,
+    u radnim procesima), a rezultati ulaze u kes pre nego sto ih ekran
+    zatrazi. Sve se pokrece iz pozadinske niti, pa UI ne ceka ni na
+    pravljenje procesa.
+    """
+    jobs = []
+    if os.path.exists(lamedb_path):
+        jobs.append(("lamedb", _lamedb_job, lamedb_path, lambda payload: _install_lamedb(lamedb_path, payload)))
+    if os.path.exists(satellites_path):
+        jobs.append(("satellites.xml", _satellites_job, satellites_path,
+                     lambda result: _install(satellites_path, *result)))
+    if not jobs:
+        return
+
+    use_processes = (in_processes and (os.cpu_count() or 1) > 1
+                     and os.access(PYTHON_EXECUTABLE, os.X_OK))
+    threading.Thread(target=_run_jobs, args=(jobs, use_processes), name="CiefpPreload", daemon=True).start()
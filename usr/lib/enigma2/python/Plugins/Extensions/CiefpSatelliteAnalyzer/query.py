@@ -0,0 +1,354 @@
+"""
+Filter jezik za lamedb upite iz Data Browser-a, npr.
+
+    stype=0x0c and caid=2600 and freq>11700
+    pos=19.2E and (provider~sky or caid=098c) and not type=tv
+
+Izraz se kompajlira jednom (compile_filter) u predikat nad servisom i
+njegovim transponderom, a klauzule koje imaju indeks u modelu (caid,
+provider, pos, system, polja transpondera) odredjuju skup kandidata, pa se
+predikat ne racuna nad svim servisima. Vrednosti sid/ns/tsid/onid/stype/
+flags/caid su heksadecimalne kao u samom lamedb-u (0x je opcion), freq je
+u MHz, sr u kSym/s, pos kao 19.2E / 30W ili u desetinama stepena (192).
+enigma2 stype pise decimalno ("12"), a plugin heksadecimalno ("0c"), pa
+stype=0x0c pogadja oba zapisa; za tv/radio/data je jednostavnije type=data.
+"""
+
+import operator
+import re
+
+from Plugins.Extensions.CiefpSatelliteAnalyzer.lamedb import pline_keys, service_category, namespace_system
+
+
+class FilterError(ValueError):
+    """Neispravan filter izraz (poruka ide direktno na ekran)"""
+
+
+POLARIZATIONS = {"h": 0, "v": 1, "l": 2, "r": 3}
+SYSTEMS = {"s": "s", "t": "t", "c": "c", "dvb-s": "s", "dvb-t": "t", "dvb-c": "c"}
+CATEGORIES = ("tv", "radio", "data")
+BOOLEANS = {"1": 1, "yes": 1, "true": 1, "0": 0, "no": 0, "false": 0}
+
+OPERATORS = {
+    "=": operator.eq, "==": operator.eq, "!=": operator.ne,
+    ">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+}
+
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|(==|!=|>=|<=|=|>|<|~)|"([^"]*)"|\'([^\']*)\'|([^\s()=!<>~"\']+))')
+
+
+# ---------------- vrednosti ----------------
+
+def _hex(value):
+    try:
+        return int(value[2:] if value.lower().startswith("0x") else value, 16)
+    except ValueError:
+        raise FilterError(f"'{value}' is not a hex number")
+
+
+def _int(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise FilterError(f"'{value}' is not a number")
+
+
+def parse_orbital(value):
+    """19.2E / 30W / 192 -> orbital u opsegu 0..3599 (kao u modelu)"""
+    text = value.strip().upper()
+    try:
+        if text.endswith(("E", "W")):
+            tenths = int(round(float(text[:-1]) * 10))
+            if text.endswith("W"):
+                tenths = -tenths
+        else:
+            tenths = int(text)
+    except ValueError:
+        raise FilterError(f"'{value}' is not an orbital position (e.g. 19.2E, 30W)")
+    return tenths + 3600 if tenths < 0 else tenths
+
+
+def _choice(mapping, what):
+    def parse(value):
+        result = mapping.get(value.lower())
+        if result is None:
+            raise FilterError(f"unknown {what} '{value}' (use {', '.join(sorted(mapping))})")
+        return result
+    return parse
+
+
+def _category(value):
+    if value.lower() not in CATEGORIES:
+        raise FilterError(f"unknown type '{value}' (use {', '.join(CATEGORIES)})")
+    return value.lower()
+
+
+# ---------------- polja ----------------
+
+def _system_of(service, tp):
+    return tp.prefix if tp is not None else namespace_system(service.namespace)
+
+
+def _stypes(service, tp):
+    # stype se u modelu cita kao hex; "12" koji je enigma2 upisala decimalno je
+    # zapravo 0x0c, pa se uporedjuju oba citanja
+    text = "%x" % service.stype
+    return (service.stype, int(text)) if text.isdigit() else (service.stype,)
+
+
+def _tp_field(name):
+    def get(service, tp):
+        return getattr(tp, name) if tp is not None else None
+    return get
+
+
+# ime -> (getter(service, tp), parser vrednosti, vrsta: 'num' / 'text' / 'list', polje transpondera)
+FIELDS = {
+    "sid": (lambda s, tp: s.sid, _hex, "num", False),
+    "ns": (lambda s, tp: s.namespace, _hex, "num", False),
+    "tsid": (lambda s, tp: s.tsid, _hex, "num", False),
+    "onid": (lambda s, tp: s.onid, _hex, "num", False),
+    "stype": (_stypes, _hex, "list", False),
+    "flags": (lambda s, tp: s.flags, _hex, "num", False),
+    "name": (lambda s, tp: s.name, str, "text", False),
+    "provider": (lambda s, tp: pline_keys(s._pline)[0], str, "text", False),
+    "caid": (lambda s, tp: pline_keys(s._pline)[1], _hex, "list", False),
+    "fta": (lambda s, tp: 0 if pline_keys(s._pline)[1] else 1, _choice(BOOLEANS, "fta value"), "num", False),
+    "type": (lambda s, tp: service_category(s.stype), _category, "text", False),
+    "pos": (lambda s, tp: s.orbital, parse_orbital, "num", False),
+    "system": (_system_of, _choice(SYSTEMS, "system"), "text", False),
+    "freq": (_tp_field("frequency"), _int, "num", True),
+    "sr": (_tp_field("symbol_rate"), _int, "num", True),
+    "pol": (_tp_field("polarization"), _choice(POLARIZATIONS, "polarization"), "num", True),
+    "fec": (_tp_field("fec"), _int, "num", True),
+    "mod": (_tp_field("modulation"), _int, "num", True),
+}
+ALIASES = {"orbital": "pos", "sat": "pos", "caids": "caid", "prov": "provider", "frequency": "freq",
+           "symbolrate": "sr", "polarization": "pol", "modulation": "mod", "category": "type"}
+
+
+# ---------------- parser ----------------
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise FilterError(f"unexpected character at {pos + 1}: '{text[pos:pos + 10]}'")
+        pos = m.end()
+        lpar, rpar, op, dq, sq, word = m.groups()
+        if lpar:
+            tokens.append(("(", lpar))
+        elif rpar:
+            tokens.append((")", rpar))
+        elif op:
+            tokens.append(("op", op))
+        elif dq is not None or sq is not None:
+            tokens.append(("value", dq if dq is not None else sq))
+        else:
+            low = word.lower()
+            tokens.append((low, word) if low in ("and", "or", "not") else ("word", word))
+    return tokens
+
+
+class _Parser(object):
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.i = 0
+
+    def peek(self):
+        return self.tokens[self.i][0] if self.i < len(self.tokens) else None
+
+    def take(self, kind=None):
+        if self.i >= len(self.tokens):
+            raise FilterError("unexpected end of filter")
+        token = self.tokens[self.i]
+        if kind and token[0] != kind:
+            raise FilterError(f"expected {kind} but got '{token[1]}'")
+        self.i += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.i < len(self.tokens):
+            raise FilterError(f"unexpected '{self.tokens[self.i][1]}'")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == "or":
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek() == "and":
+            self.take()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self):
+        if self.peek() == "not":
+            self.take()
+            return ("not", self.parse_not())
+        if self.peek() == "(":
+            self.take()
+            node = self.parse_or()
+            self.take(")")
+            return node
+        return self.parse_clause()
+
+    def parse_clause(self):
+        field = self.take("word")[1].lower()
+        field = ALIASES.get(field, field)
+        if field not in FIELDS:
+            raise FilterError(f"unknown field '{field}' (fields: {', '.join(sorted(FIELDS))})")
+        op = self.take("op")[1]
+        kind, value = self.take()
+        if kind not in ("word", "value"):
+            raise FilterError(f"missing value after '{field}{op}'")
+        return _compile_clause(field, op, value)
+
+
+# ---------------- kompajliranje ----------------
+
+def _compile_clause(field, op, raw):
+    get, parse, kind, on_tp = FIELDS[field]
+    value = parse(raw)
+
+    if op == "~":
+        if kind != "text":
+            raise FilterError(f"'~' works only on text fields, not on '{field}'")
+        needle = value.lower()
+
+        def predicate(service, tp):
+            return needle in (get(service, tp) or "").lower()
+    elif kind == "text":
+        if op not in ("=", "==", "!="):
+            raise FilterError(f"'{op}' cannot be used with '{field}'")
+        value = value.lower()
+        equal = op != "!="
+
+        def predicate(service, tp):
+            return ((get(service, tp) or "").lower() == value) is equal
+    elif kind == "list":
+        compare = OPERATORS[op]
+        if op == "!=":
+            def predicate(service, tp):
+                return value not in get(service, tp)
+        else:
+            def predicate(service, tp):
+                for item in get(service, tp):
+                    if compare(item, value):
+                        return True
+                return False
+    else:
+        compare = OPERATORS[op]
+
+        def predicate(service, tp):
+            current = get(service, tp)
+            return current is not None and compare(current, value)
+
+    return ("clause", field, op, value, predicate, on_tp)
+
+
+def _compile(node):
+    kind = node[0]
+    if kind == "clause":
+        return node[4]
+    if kind == "not":
+        inner = _compile(node[1])
+        return lambda service, tp: not inner(service, tp)
+    children = [_compile(child) for child in node[1]]
+    if kind == "and":
+        return lambda service, tp: all(child(service, tp) for child in children)
+    return lambda service, tp: any(child(service, tp) for child in children)
+
+
+# ---------------- plan (indeksi) ----------------
+
+def _candidates(node, model):
+    """-> (lista kandidata, opis indeksa) ili None kad je potreban prolaz kroz sve servise"""
+    kind = node[0]
+    if kind == "clause":
+        _, field, op, value, predicate, on_tp = node
+        if on_tp and op != "~":
+            # Filter nad transponderima (znatno manje ih je), pa servisi po TP-u
+            result = []
+            for key, tp in model.transponders.items():
+                if predicate(None, tp):
+                    result.extend(model.services_by_tp.get(key, ()))
+            return result, field
+        if op not in ("=", "=="):
+            return None
+        if field == "caid":
+            return model.services_for_caid(value), "caid"
+        if field == "provider":
+            result = []
+            for provider, services in model.by_provider.items():
+                if provider.lower() == value:
+                    result.extend(services)
+            return result, "provider"
+        if field == "pos":
+            return model.services_for_orbital(value), "pos"
+        if field == "system":
+            return model.services_for_system(value), "system"
+        return None
+    if kind == "and":
+        best = None
+        for child in node[1]:
+            plan = _candidates(child, model)
+            if plan is not None and (best is None or len(plan[0]) < len(best[0])):
+                best = plan
+        return best
+    if kind == "or":
+        plans = [_candidates(child, model) for child in node[1]]
+        if any(plan is None for plan in plans):
+            return None
+        seen = set()
+        result = []
+        for services, _ in plans:
+            for service in services:
+                if id(service) not in seen:
+                    seen.add(id(service))
+                    result.append(service)
+        return result, "+".join(label for _, label in plans)
+    return None
+
+
+class Filter(object):
+    """Kompajliran filter: predikat + plan nad indeksima modela"""
+
+    def __init__(self, text, node):
+        self.text = text
+        self.node = node
+        self.predicate = _compile(node)
+
+    def run(self, model, stats=None):
+        """
+        Generator servisa koji zadovoljavaju filter (redom iz indeksa, bez
+        sortiranja), da bi ekran mogao da ih prikazuje dok stizu.
+        stats dobija 'plan' (korisceni indeks ili 'full scan') i 'scanned'.
+        """
+        if stats is None:
+            stats = {}
+        plan = _candidates(self.node, model)
+        services, stats['plan'] = plan if plan is not None else (model.services, "full scan")
+        stats['scanned'] = 0
+        predicate = self.predicate
+        transponders = model.transponders
+        for service in services:
+            stats['scanned'] += 1
+            if predicate(service, transponders.get(service.tp)):
+                yield service
+
+
+def compile_filter(text):
+    """Tekst filtera -> Filter; greska u izrazu -> FilterError"""
+    tokens = _tokenize(text or "")
+    if not tokens:
+        raise FilterError("empty filter")
+    return Filter(text.strip(), _Parser(tokens).parse())